@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+'''
+Loads lots of tracker modules (.fur, .dmf, .ftm) at once, spread out over
+a process pool.
+'''
+
+import os, sys, zlib, traceback
+from collections import namedtuple
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# the libraries live in their own folders
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+for lib_dir in ('furnace', 'deflemask', 'famitracker'):
+	lib_path = os.path.join(ROOT, lib_dir)
+	if lib_path not in sys.path:
+		sys.path.insert(1, lib_path)
+
+from furnacelib import FurnaceModule
+from furnacelib.module import FUR_STRING
+from furnacelib.stream import InflateStream
+from deflelib import DeflemaskModule, DMF_STRING
+from ftmlib import FamitrackerModule, FTM_MAGIC
+
+# result of loading a single file, `module` is None if loading failed
+BatchResult = namedtuple("BatchResult", ["file_name", "format", "module", "error"])
+
+def detect_format(file_name):
+	'''
+	Returns "fur", "dmf" or "ftm" depending on the file's magic number,
+	or None if it's none of those. Compressed files only have their
+	first few bytes inflated.
+	'''
+	with open(file_name, "rb") as mod_in:
+		head = mod_in.read(len(FTM_MAGIC))
+		if head.startswith(FTM_MAGIC):
+			return "ftm"
+		if head.startswith(FUR_STRING):
+			return "fur"
+
+		# .dmf files are always compressed, .fur files can be
+		mod_in.seek(0)
+		try:
+			head = InflateStream(mod_in).read(16)
+		except zlib.error:
+			return None
+	if head.startswith(FUR_STRING):
+		return "fur"
+	if head.startswith(DMF_STRING):
+		return "dmf"
+	return None
+
+def load_module(file_name, format=None):
+	'''
+	Loads a single module, detecting its format if not given.
+	'''
+	format = format or detect_format(file_name)
+	if format == "fur":
+		return FurnaceModule(file_name=file_name)
+	elif format == "dmf":
+		module = DeflemaskModule()
+	elif format == "ftm":
+		module = FamitrackerModule()
+	else:
+		raise Exception(f"Unknown module format: {file_name}")
+	module.load_from_file(file_name)
+	return module
+
+# ParseCache for each cache directory, made once per process
+_caches = {}
+
+def _load_result(file_name, cache_dir=None):
+	format = None
+	try:
+		format = detect_format(file_name)
+		if cache_dir is None:
+			module = load_module(file_name, format)
+		else:
+			if cache_dir not in _caches:
+				from modcache import ParseCache
+				_caches[cache_dir] = ParseCache(cache_dir)
+			module = _caches[cache_dir].load(file_name, format)
+		return BatchResult(file_name, format, module, None)
+	except Exception:
+		# keep the traceback, it doesn't survive the trip back from
+		# the worker process otherwise
+		return BatchResult(file_name, format, None, traceback.format_exc())
+
+def load_modules(file_names, workers=None, ordered=True, cache_dir=None):
+	'''
+	Loads every file in `file_names` across `workers` processes (default:
+	one per CPU), yielding a BatchResult for each one. A file that fails
+	to load doesn't stop the batch; its BatchResult has the traceback in
+	`error` instead.
+
+	If `ordered` is set, results come in the same order as `file_names`,
+	otherwise they come as soon as each file is done.
+
+	workers=1 loads everything in this process.
+
+	If `cache_dir` is given, modules go through a modcache.ParseCache
+	kept there, so unchanged files aren't parsed again.
+	'''
+	file_names = list(file_names)
+	load = partial(_load_result, cache_dir=cache_dir)
+	if workers == 1:
+		for file_name in file_names:
+			yield load(file_name)
+		return
+
+	with ProcessPoolExecutor(max_workers=workers) as pool:
+		if ordered:
+			yield from pool.map(load, file_names)
+		else:
+			jobs = [pool.submit(load, i) for i in file_names]
+			for job in as_completed(jobs):
+				yield job.result()
+
+if __name__ == '__main__':
+	args = sys.argv[1:]
+	cache_dir = None
+	if args[:1] == ['--cache']:
+		cache_dir = args[1]
+		args = args[2:]
+	if len(args) < 1:
+		print("modbatch.py [--cache dir] [module files...]")
+		print()
+		print("Loads every module given and prints a summary of each one")
+		exit(0)
+
+	failed = 0
+	for result in load_modules(args, ordered=False, cache_dir=cache_dir):
+		if result.error is None:
+			print(f"{result.file_name}: {result.module}")
+		else:
+			failed += 1
+			print(f"{result.file_name}: FAILED\n{result.error}")
+	print(f"\n{len(args) - failed} loaded, {failed} failed")
@@ -0,0 +1,166 @@
+#!/usr/bin/python3
+'''
+On-disk cache of parsed tracker modules, so unchanged modules don't have
+to be parsed again.
+'''
+
+import os, time, hashlib, pickle, zlib, tempfile
+
+import modbatch
+
+# the parser libraries; if any of these change, the cache is invalidated
+LIBRARY_SOURCES = [
+	os.path.join(modbatch.ROOT, 'furnace', 'furnacelib'),
+	os.path.join(modbatch.ROOT, 'deflemask', 'deflelib.py'),
+	os.path.join(modbatch.ROOT, 'famitracker', 'ftmlib.py'),
+]
+
+# temporary files older than this (in seconds) were left behind by a
+# process that died while writing an entry
+STALE_TEMP_AGE = 60 * 60
+
+def library_version():
+	'''
+	A hash of the parser libraries' source code. Used as the parser
+	version, so the cache never hands out modules parsed by older code.
+	'''
+	return source_hash(LIBRARY_SOURCES)
+
+def source_hash(sources):
+	'''
+	A hash of the .py files in `sources`, which are files or folders.
+	'''
+	digest = hashlib.sha256()
+	for source in sources:
+		if os.path.isdir(source):
+			files = sorted(
+				os.path.join(source, i) for i in os.listdir(source)
+				if i.endswith('.py')
+			)
+		else:
+			files = [source]
+		for file_name in files:
+			with open(file_name, 'rb') as src:
+				digest.update(src.read())
+	return digest.hexdigest()[:16]
+
+def content_hash(file_name):
+	digest = hashlib.sha256()
+	with open(file_name, 'rb') as mod_in:
+		for chunk in iter(lambda: mod_in.read(1 << 16), b''):
+			digest.update(chunk)
+	return digest.hexdigest()
+
+class ParseCache:
+	'''
+	Stores parsed modules (FurnaceModule, DeflemaskModule,
+	FamitrackerModule) as compressed pickles in `directory`, keyed by
+	(content hash, library version).
+
+	When the cache grows beyond `max_bytes`, the least recently used
+	entries are removed first.
+	'''
+	def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+		self.directory = directory
+		self.max_bytes = max_bytes
+		self.version = library_version()
+		os.makedirs(directory, exist_ok=True)
+
+	def entry_path(self, digest):
+		return os.path.join(self.directory, f'{digest}-{self.version}.pickle.z')
+
+	def get(self, digest):
+		'''
+		Returns the cached module for a content hash, or None.
+		'''
+		path = self.entry_path(digest)
+		try:
+			with open(path, 'rb') as entry:
+				module = pickle.loads(zlib.decompress(entry.read()))
+		except FileNotFoundError:
+			return None
+		except Exception:
+			# broken entry, just parse it again
+			self.__remove(path)
+			return None
+		# mark as recently used, unless it was evicted in the meantime
+		try:
+			os.utime(path)
+		except FileNotFoundError:
+			pass
+		return module
+
+	def put(self, digest, module):
+		data = zlib.compress(pickle.dumps(module, pickle.HIGHEST_PROTOCOL))
+		# write to a temporary file first so other processes never see a
+		# half-written entry
+		handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+		try:
+			with os.fdopen(handle, 'wb') as entry:
+				entry.write(data)
+			os.replace(temp_path, self.entry_path(digest))
+		except BaseException:
+			os.remove(temp_path)
+			raise
+		self.evict()
+
+	def load(self, file_name, format=None):
+		'''
+		Loads a module through the cache, parsing (and caching) it only
+		if needed.
+		'''
+		digest = content_hash(file_name)
+		module = self.get(digest)
+		if module is None:
+			module = modbatch.load_module(file_name, format)
+			self.put(digest, module)
+		# this is a property of the file, not the contents
+		module.file_name = file_name
+		return module
+
+	def evict(self):
+		'''
+		Removes entries left behind by other library versions and stale
+		temporary files, then the least recently used entries until the
+		cache fits in `max_bytes`.
+		'''
+		entries = []
+		now = time.time()
+		for i in os.listdir(self.directory):
+			path = os.path.join(self.directory, i)
+			if i.endswith('.tmp'):
+				# another process might still be writing a newer one
+				try:
+					if now - os.stat(path).st_mtime > STALE_TEMP_AGE:
+						self.__remove(path)
+				except FileNotFoundError:
+					pass
+				continue
+			if not i.endswith('.pickle.z'):
+				continue
+			if not i.endswith(f'-{self.version}.pickle.z'):
+				self.__remove(path)
+				continue
+			try:
+				info = os.stat(path)
+			except FileNotFoundError:
+				continue
+			entries.append((info.st_mtime, info.st_size, path))
+
+		total = sum(i[1] for i in entries)
+		for mtime, size, path in sorted(entries):
+			if total <= self.max_bytes:
+				break
+			self.__remove(path)
+			total -= size
+
+	def clear(self):
+		for i in os.listdir(self.directory):
+			if i.endswith('.pickle.z'):
+				self.__remove(os.path.join(self.directory, i))
+
+	def __remove(self, path):
+		try:
+			os.remove(path)
+		except FileNotFoundError:
+			pass
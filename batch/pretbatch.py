@@ -0,0 +1,299 @@
+#!/usr/bin/python3
+'''
+Converts lots of tracker modules (.fur, .dmf, .ftm) and MML files to pret
+.asm files at once, spread out over a process pool, instead of running
+fur2pret.py, dmf2pret.py, ftm2pret.py or mml2pret.py once for each file.
+'''
+
+import os, sys, glob, time, tempfile, traceback
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# also puts the libraries (and the *2pret scripts next to them) in sys.path
+import modbatch
+from pretmanifest import BuildManifest
+
+MML_PATH = os.path.join(modbatch.ROOT, 'mml')
+if MML_PATH not in sys.path:
+	sys.path.insert(1, MML_PATH)
+
+import fur2pret, dmf2pret, ftm2pret, mml2pret
+
+# format -> function converting a file to an asm string
+CONVERTERS = {
+	"fur": fur2pret.convert_file,
+	"dmf": dmf2pret.convert_file,
+	"ftm": ftm2pret.convert_file,
+	"mml": mml2pret.convert_file,
+}
+
+MODULE_EXTENSIONS = ('.fur', '.dmf', '.ftm', '.mml')
+
+# name of the manifest kept in the output folder, see BuildManifest
+MANIFEST_NAME = '.pretbatch.json'
+
+# result of converting a single file, `error` is None if it worked and
+# `skipped` is set if it was already up to date
+ConvertResult = namedtuple(
+	"ConvertResult",
+	["file_name", "output_name", "format", "seconds", "error", "skipped"],
+	defaults=(False,)
+)
+
+def find_modules(patterns):
+	'''
+	Expands glob patterns (with ** for subfolders) into a sorted list of
+	files. Folders are searched for modules, but not their subfolders.
+	'''
+	file_names = set()
+	for pattern in patterns:
+		for match in glob.glob(pattern, recursive=True):
+			if os.path.isdir(match):
+				file_names.update(
+					os.path.join(match, i) for i in os.listdir(match)
+					if i.lower().endswith(MODULE_EXTENSIONS)
+				)
+			else:
+				file_names.add(match)
+	return sorted(file_names)
+
+def detect_format(file_name):
+	'''
+	Like modbatch.detect_format, but also knows MML files, which are
+	plain text and go by their extension.
+	'''
+	if file_name.lower().endswith('.mml'):
+		return "mml"
+	return modbatch.detect_format(file_name)
+
+def output_name_for(file_name, output_dir):
+	base_name = os.path.splitext(os.path.basename(file_name))[0]
+	return os.path.join(output_dir, f'{base_name}.asm')
+
+def convert_module(file_name, output_name, format=None):
+	'''
+	Converts a single module, detecting its format if not given. The .asm
+	file only appears once it's complete.
+	'''
+	format = format or detect_format(file_name)
+	if format not in CONVERTERS:
+		raise Exception(f"Unknown module format: {file_name}")
+	asm = CONVERTERS[format](file_name)
+
+	handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(output_name) or '.', suffix='.tmp')
+	try:
+		with os.fdopen(handle, 'w') as asm_out:
+			asm_out.write(asm)
+		os.replace(temp_path, output_name)
+	except BaseException:
+		os.remove(temp_path)
+		raise
+
+def _convert_result(job):
+	file_name, output_name, format = job
+	start = time.perf_counter()
+	try:
+		format = format or detect_format(file_name)
+		convert_module(file_name, output_name, format)
+		return ConvertResult(file_name, output_name, format, time.perf_counter() - start, None)
+	except Exception:
+		return ConvertResult(
+			file_name, output_name, format, time.perf_counter() - start,
+			traceback.format_exc()
+		)
+
+def convert_modules(file_names, output_dir, workers=None, ordered=True, rebuild=False):
+	'''
+	Converts every file in `file_names` to an .asm file of the same name in
+	`output_dir`, across `workers` processes (default: one per CPU),
+	yielding a ConvertResult for each one. Like modbatch.load_modules, a
+	file that fails doesn't stop the batch.
+
+	Files that haven't changed since they were last converted (by the same
+	converter version) are skipped, unless `rebuild` is set. This is
+	tracked in a BuildManifest kept in `output_dir`.
+
+	Results come in the same order as `file_names` if `ordered` is set.
+	Otherwise skipped files come first, then the rest as they finish.
+
+	Two modules with the same name would end up in the same .asm file, so
+	that's checked before anything is converted.
+	'''
+	jobs = [(i, output_name_for(i, output_dir)) for i in file_names]
+	seen = {}
+	for file_name, output_name in jobs:
+		if output_name in seen:
+			raise Exception(f"{seen[output_name]} and {file_name} would both be converted to {output_name}")
+		seen[output_name] = file_name
+	os.makedirs(output_dir, exist_ok=True)
+
+	manifest = BuildManifest(os.path.join(output_dir, MANIFEST_NAME))
+	# output file -> (input path, output path, build key) for the manifest
+	keys = {}
+	stale = []
+	# the result for each skipped file, None for the ones to convert
+	skipped = []
+	for file_name, output_name in jobs:
+		input_path = os.path.abspath(file_name)
+		output_path = os.path.abspath(output_name)
+		try:
+			format = detect_format(file_name)
+			key = manifest.build_key(input_path, format) if format in CONVERTERS else None
+		except OSError:
+			# let the conversion report it
+			format = None
+			key = None
+		if (key is not None) and (not rebuild) and manifest.is_current(input_path, output_path, key):
+			skipped.append(ConvertResult(file_name, output_name, format, 0.0, None, True))
+			continue
+		skipped.append(None)
+		keys[output_name] = (input_path, output_path, key)
+		stale.append((file_name, output_name, format))
+
+	def finished(result):
+		input_path, output_path, key = keys[result.output_name]
+		if (result.error is None) and (key is not None):
+			manifest.record(input_path, output_path, key)
+		else:
+			manifest.forget(output_path)
+		return result
+
+	def in_order(results):
+		# slots the (ordered) conversion results in between the skipped ones
+		for result in skipped:
+			yield result if result is not None else finished(next(results))
+
+	try:
+		if workers == 1:
+			yield from in_order(map(_convert_result, stale))
+			return
+
+		with ProcessPoolExecutor(max_workers=workers) as pool:
+			if ordered:
+				yield from in_order(pool.map(_convert_result, stale))
+			else:
+				yield from (i for i in skipped if i is not None)
+				for job in as_completed([pool.submit(_convert_result, i) for i in stale]):
+					yield finished(job.result())
+	finally:
+		manifest.save()
+
+def poll_modules(patterns, known):
+	'''
+	Returns the files matched by `patterns` that are new or have changed
+	size or modification time since the last call. `known` holds what was
+	seen last time, and is updated.
+	'''
+	changed = []
+	found = {}
+	for file_name in find_modules(patterns):
+		try:
+			info = os.stat(file_name)
+		except FileNotFoundError:
+			continue
+		found[file_name] = (info.st_size, info.st_mtime_ns)
+		if known.get(file_name) != found[file_name]:
+			changed.append(file_name)
+	known.clear()
+	known.update(found)
+	return changed
+
+def watch_modules(patterns, output_dir, interval=0.1, debounce=0.2, known=None):
+	'''
+	Converts the files matched by `patterns` whenever they change, yielding
+	a ConvertResult for each one, until interrupted. Only files that
+	changed since `watch_modules` was called are converted, and new files
+	are picked up as they appear.
+
+	`known` is a poll_modules snapshot to compare against instead. Take it
+	before converting everything up front, so files saved while that's
+	going on are converted again.
+
+	Files are polled every `interval` seconds. Saving a file often means
+	several writes in a row, so a file is only converted once it's been
+	left alone for `debounce` seconds. Everything is converted in this
+	process, which stays loaded between changes.
+	'''
+	if known is None:
+		known = {}
+		poll_modules(patterns, known)
+	# file -> when it was last seen changing
+	pending = {}
+	while True:
+		time.sleep(interval)
+		now = time.monotonic()
+		for file_name in poll_modules(patterns, known):
+			pending[file_name] = now
+		ready = sorted(i for i in pending if now - pending[i] >= debounce)
+		for file_name in ready:
+			del pending[file_name]
+		if ready:
+			yield from convert_modules(ready, output_dir, workers=1)
+
+if __name__ == '__main__':
+	args = sys.argv[1:]
+	output_dir = '.'
+	workers = None
+	rebuild = False
+	watch = False
+	while args[:1] in (['-o'], ['-j'], ['-B'], ['--watch']):
+		if args[0] in ('-B', '--watch'):
+			rebuild = rebuild or (args[0] == '-B')
+			watch = watch or (args[0] == '--watch')
+			args = args[1:]
+			continue
+		if args[0] == '-o':
+			output_dir = args[1]
+		else:
+			workers = int(args[1])
+		args = args[2:]
+	if len(args) < 1:
+		print("pretbatch.py [-o output dir] [-j workers] [-B] [--watch] [modules, folders or globs...]")
+		print()
+		print("Converts every .fur, .dmf, .ftm and .mml file given into an .asm file")
+		print("of the same name for the GB/GBC Pokemon disassemblies")
+		print()
+		print("- Globs are expanded here, use ** to include subfolders")
+		print("- Files that haven't changed since the last run are skipped,")
+		print("  -B converts everything again")
+		print("- Failed conversions are listed at the end")
+		print("- With --watch, files keep being converted as they're saved")
+		print("  until Ctrl+C is pressed")
+		exit(0)
+
+	# snapshot for --watch, from before anything's converted
+	known = {}
+	poll_modules(args, known)
+	file_names = sorted(known)
+	start = time.perf_counter()
+	failed = []
+	skipped = 0
+	for result in convert_modules(file_names, output_dir, workers=workers, ordered=False, rebuild=rebuild):
+		if result.skipped:
+			skipped += 1
+		elif result.error is None:
+			print(f"{result.file_name} -> {result.output_name} ({result.seconds:.2f}s)")
+		else:
+			failed.append(result)
+			print(f"{result.file_name}: FAILED ({result.seconds:.2f}s)")
+	elapsed = time.perf_counter() - start
+
+	for result in failed:
+		print(f"\n{result.file_name}:\n{result.error}")
+	converted = len(file_names) - len(failed) - skipped
+	print(f"\n{converted} converted, {skipped} up to date, {len(failed)} failed in {elapsed:.2f}s")
+
+	if watch:
+		print("\nWatching for changes, press Ctrl+C to stop")
+		try:
+			for result in watch_modules(args, output_dir, known=known):
+				if result.skipped:
+					continue
+				if result.error is None:
+					print(f"{result.file_name} -> {result.output_name} ({result.seconds:.2f}s)", flush=True)
+				else:
+					print(f"{result.file_name}: FAILED ({result.seconds:.2f}s)\n{result.error}", flush=True)
+		except KeyboardInterrupt:
+			pass
+	elif failed:
+		exit(1)
@@ -0,0 +1,134 @@
+#!/usr/bin/python3
+'''
+Make-style bookkeeping for pretbatch.py: remembers what each .asm file was
+built from, so only modules that changed since the last run are converted
+again.
+'''
+
+import os, json, hashlib, tempfile
+
+import modbatch
+from modcache import content_hash, source_hash
+
+# the converter and library behind each format; if any of these change,
+# everything in that format is converted again
+CONVERTER_SOURCES = {
+	"fur": [
+		os.path.join(modbatch.ROOT, 'furnace', 'fur2pret.py'),
+		os.path.join(modbatch.ROOT, 'furnace', 'furnacelib'),
+	],
+	"dmf": [
+		os.path.join(modbatch.ROOT, 'deflemask', 'dmf2pret.py'),
+		os.path.join(modbatch.ROOT, 'deflemask', 'deflelib.py'),
+	],
+	"ftm": [
+		os.path.join(modbatch.ROOT, 'famitracker', 'ftm2pret.py'),
+		os.path.join(modbatch.ROOT, 'famitracker', 'ftmlib.py'),
+	],
+	"mml": [
+		os.path.join(modbatch.ROOT, 'mml', 'mml2pret.py'),
+	],
+}
+
+# format -> converter version, worked out once per process
+_versions = {}
+
+def converter_version(format):
+	'''
+	A hash of the source code of a format's converter.
+	'''
+	if format not in _versions:
+		_versions[format] = source_hash(CONVERTER_SOURCES[format])
+	return _versions[format]
+
+class BuildManifest:
+	'''
+	Maps each output file to the key it was built with: a hash of the input
+	file's contents, the converter version and the options used. An output
+	is up to date if it still exists and its key hasn't changed.
+
+	Like make, input files are only hashed again when their size or
+	modification time changed. The manifest is kept as JSON in `file_name`
+	and only written by `save`.
+	'''
+	def __init__(self, file_name):
+		self.file_name = file_name
+		self.entries = {}
+		try:
+			with open(file_name, 'r') as manifest:
+				self.entries = json.load(manifest)
+		except FileNotFoundError:
+			pass
+		except ValueError:
+			# broken manifest, everything just gets converted again
+			pass
+
+		# input file -> (size, mtime, content hash), from the last run
+		self.__hashes = {}
+		for entry in self.entries.values():
+			self.__hashes[entry["input"]] = tuple(entry["inputStat"]) + (entry["inputHash"],)
+
+	def input_hash(self, input_name):
+		info = os.stat(input_name)
+		known = self.__hashes.get(input_name)
+		if (known is not None) and (known[:2] == (info.st_size, info.st_mtime_ns)):
+			return known[2]
+		digest = content_hash(input_name)
+		self.__hashes[input_name] = (info.st_size, info.st_mtime_ns, digest)
+		return digest
+
+	def build_key(self, input_name, format, options=None):
+		key = hashlib.sha256()
+		key.update(self.input_hash(input_name).encode())
+		key.update(converter_version(format).encode())
+		key.update(json.dumps(options or {}, sort_keys=True).encode())
+		return key.hexdigest()
+
+	def is_current(self, input_name, output_name, key):
+		'''
+		True if `output_name` was built from `input_name` with the same
+		`build_key` as now.
+		'''
+		entry = self.entries.get(output_name)
+		if (entry is None) or (entry["input"] != input_name):
+			return False
+		try:
+			info = os.stat(output_name)
+		except FileNotFoundError:
+			return False
+		# the output was changed or replaced by something else
+		if [info.st_size, info.st_mtime_ns] != entry["outputStat"]:
+			return False
+		if entry["key"] != key:
+			return False
+		# the input might've just been touched, no need to hash it again
+		# next time
+		if input_name in self.__hashes:
+			entry["inputStat"] = list(self.__hashes[input_name][:2])
+		return True
+
+	def record(self, input_name, output_name, key):
+		'''
+		Notes that `output_name` was just built from `input_name`. `key`
+		should be worked out before converting, so that an input changed
+		in the meantime is converted again next time.
+		'''
+		size, mtime, digest = self.__hashes[input_name]
+		info = os.stat(output_name)
+		self.entries[output_name] = {
+			"input": input_name,
+			"key": key,
+			"inputStat": [size, mtime],
+			"inputHash": digest,
+			"outputStat": [info.st_size, info.st_mtime_ns],
+		}
+
+	def forget(self, output_name):
+		self.entries.pop(output_name, None)
+
+	def save(self):
+		directory = os.path.dirname(self.file_name) or '.'
+		handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+		with os.fdopen(handle, 'w') as manifest:
+			json.dump(self.entries, manifest, indent='\t', sort_keys=True)
+		os.replace(temp_path, self.file_name)
@@ -9,9 +9,16 @@ Only tested with GameBoy modules!!!
 
 import zlib
 import io
+from collections import namedtuple
 
 DMF_STRING  = b'.DelekDefleMask.'
 
+# basic module information, as returned by DeflemaskModule.probe
+DeflemaskModuleSummary = namedtuple(
+	"DeflemaskModuleSummary",
+	["name", "author", "version", "chips", "channels", "order_length"]
+)
+
 read_byte = lambda x, y: int.from_bytes(x.read(y), 'little')
 
 def determine_system(system_id):
@@ -48,6 +55,56 @@ def determine_clock_speed(frames_mode, custom_flag):
 		return "NTSC"
 	return ""
 
+class InflateStream:
+	'''
+	Seekable, read-only stream over a zlib-compressed stream. Only
+	decompresses as far as has been read so far.
+	'''
+	def __init__(self, source, chunk_size=4096):
+		self.source = source
+		self.chunk_size = chunk_size
+		self.inflater = zlib.decompressobj()
+		self.buffer = bytearray()
+		self.pos = 0
+		self.eof = False
+	
+	def inflate_until(self, end):
+		# end=None inflates everything
+		while (not self.eof) and ((end is None) or (len(self.buffer) < end)):
+			chunk = self.source.read(self.chunk_size)
+			if chunk:
+				self.buffer += self.inflater.decompress(chunk)
+			else:
+				self.buffer += self.inflater.flush()
+				self.eof = True
+			if self.inflater.eof:
+				self.eof = True
+	
+	def read(self, size=-1):
+		start = self.pos
+		if (size is None) or (size < 0):
+			self.inflate_until(None)
+			end = len(self.buffer)
+		else:
+			self.inflate_until(start + size)
+			end = min(start + size, len(self.buffer))
+		self.pos = max(end, start)
+		return bytes(self.buffer[start:end])
+	
+	def seek(self, offset, whence=io.SEEK_SET):
+		if whence == io.SEEK_CUR:
+			offset += self.pos
+		elif whence == io.SEEK_END:
+			self.inflate_until(None)
+			offset += len(self.buffer)
+		if offset < 0:
+			raise ValueError(f"Negative seek position {offset}")
+		self.pos = offset
+		return self.pos
+	
+	def tell(self):
+		return self.pos
+
 class DeflemaskModule:
 	def __init__(self):
 		self.file_name = None
@@ -78,7 +135,9 @@ class DeflemaskModule:
 			]
 		}
 	
-	def load_from_stream(self, de_dmf):
+	def load_header_from_stream(self, de_dmf):
+		# reads everything up to the pattern matrix
+		# out : (tuple) (num_channels, num_matrix_rows)
 		dmf_struct = self.module
 		
 		if de_dmf.read(16) != DMF_STRING:
@@ -127,6 +186,14 @@ class DeflemaskModule:
 			arp_tick_speed = read_byte(de_dmf, 1)
 			dmf_struct["meta"]["arp_tick_speed"] = arp_tick_speed
 		
+		return (num_channels, num_matrix_rows)
+	
+	def load_from_stream(self, de_dmf):
+		dmf_struct = self.module
+		
+		num_channels, num_matrix_rows = self.load_header_from_stream(de_dmf)
+		num_pattern_rows = dmf_struct["pattern_rows"]
+		
 		# matrix
 		matrices = []
 		for c in range(num_channels):
@@ -331,7 +398,23 @@ class DeflemaskModule:
 	def load_from_file(self, file_name):
 		self.file_name = file_name
 		with open(file_name, "rb") as dmf_in:
-			return self.load_from_bytes(zlib.decompress(dmf_in.read()))
+			return self.load_from_stream(InflateStream(dmf_in))
+	
+	def probe(file_name):
+		# Reads only the module header, returns a DeflemaskModuleSummary.
+		# Only the first few KB of the file get decompressed.
+		# Does not need instantiation to be run.
+		dmf = DeflemaskModule()
+		with open(file_name, "rb") as dmf_in:
+			num_channels, num_matrix_rows = dmf.load_header_from_stream(InflateStream(dmf_in))
+		return DeflemaskModuleSummary(
+			name=dmf.get_module_title(),
+			author=dmf.module["meta"]["author"],
+			version=dmf.get_module_version(),
+			chips=(dmf.get_module_system(),),
+			channels=num_channels,
+			order_length=num_matrix_rows
+		)
 	
 	def decompress_to_file(self, in_file, out_file):
 		with open(in_file, "rb") as dmf_in:
@@ -5,11 +5,17 @@ Tool to convert *.ftm files to pret-compatible music files
 '''
 
 from ftmlib import FamitrackerModule
-import datetime, sys
+import datetime, sys, io
 
-if __name__ == '__main__':
-	fami = FamitrackerModule()
-	fami.load_from_file(sys.argv[1])
+def convert(fami, stream=None):
+	'''
+	Writes the asm for a loaded FamitrackerModule to `stream`, or returns
+	it as a string if no stream is given.
+	'''
+	if stream is None:
+		stream = io.StringIO()
+		convert(fami, stream)
+		return stream.getvalue()
 
 	# single song for now
 	song = fami.module['songs'][0]
@@ -58,7 +64,7 @@ if __name__ == '__main__':
 		if note_duty is not None:
 			if state['prev_duty'] != note_duty:
 				state['prev_duty'] = note_duty
-				print(f'\tduty_cycle {note_duty}')
+				print(f'\tduty_cycle {note_duty}', file=stream)
 		
 		# change volume (volume column)
 		note_volume = prev_row['volume']
@@ -93,10 +99,10 @@ if __name__ == '__main__':
 		if state['volume_changed'] or state['envelope_changed']:
 			try:
 				if state['channel'] < 2:
-					print(f'\tnote_type 12, {state["prev_volume"]}, {to_gb_env(state["prev_envelope"])}')
+					print(f'\tnote_type 12, {state["prev_volume"]}, {to_gb_env(state["prev_envelope"])}', file=stream)
 				elif state['channel'] == 2:
 					# don't remap Axx effects for triangle channel
-					print(f'\tnote_type 12, {state["prev_volume"]}, {state["prev_envelope"]}')
+					print(f'\tnote_type 12, {state["prev_volume"]}, {state["prev_envelope"]}', file=stream)
 			except:
 				pass
 		
@@ -110,7 +116,7 @@ if __name__ == '__main__':
 		if state['prev_octave'] != note_octave:
 			if note_octave is not None:
 				if state['channel'] < 3:
-					print(f'\toctave {note_octave}')
+					print(f'\toctave {note_octave}', file=stream)
 				state['prev_octave'] = note_octave
 		
 		# determine length
@@ -123,42 +129,42 @@ if __name__ == '__main__':
 			tmp_counter = note_length
 			while tmp_counter - 16 > 0:
 				if (note == '--') or (note is None):
-					print(f'\trest 16')
+					print(f'\trest 16', file=stream)
 				else:
 					if state['channel'] == 3:
-						print(f'\tdrum_note {constify(state["song_title"])}_DRUM_{note_instrument}, 16')
+						print(f'\tdrum_note {constify(state["song_title"])}_DRUM_{note_instrument}, 16', file=stream)
 					else:
-						print(f'\tnote {note}, 16')
+						print(f'\tnote {note}, 16', file=stream)
 				tmp_counter = tmp_counter - 16
 			
 			# note or rest
 			if (note == '--') or (note is None):
-				print(f'\trest {tmp_counter}')
+				print(f'\trest {tmp_counter}', file=stream)
 			else:
 				if note:
 					if state['channel'] == 3:
-						print(f'\tdrum_note {constify(state["song_title"])}_DRUM_{note_instrument}, {tmp_counter}')
+						print(f'\tdrum_note {constify(state["song_title"])}_DRUM_{note_instrument}, {tmp_counter}', file=stream)
 					else:
-						print(f'\tnote {note}, {tmp_counter}')
+						print(f'\tnote {note}, {tmp_counter}', file=stream)
 		else:
 			# note or rest
 			if (note == '--') or (note is None):
-				print(f'\trest {note_length}')
+				print(f'\trest {note_length}', file=stream)
 			else:
 				if note:
 					if state['channel'] == 3:
-						print(f'\tdrum_note {constify(state["song_title"])}_DRUM_{note_instrument}, {note_length}')
+						print(f'\tdrum_note {constify(state["song_title"])}_DRUM_{note_instrument}, {note_length}', file=stream)
 					else:
-						print(f'\tnote {note}, {note_length}')
+						print(f'\tnote {note}, {note_length}', file=stream)
 					state["cur_note"] = note
 					note_rendered = True
 				# retrigger note in case of volume or effects column
 				if not note_rendered:
 					if prev_row['volume'] or (len(prev_row['effects']) > 0):
 						if state['channel'] == 3:
-							print(f'\tdrum_note {constify(state["song_title"])}_DRUM_{note_instrument}, {note_length}')
+							print(f'\tdrum_note {constify(state["song_title"])}_DRUM_{note_instrument}, {note_length}', file=stream)
 						else:
-							print(f'\tnote {state["cur_note"]}, {note_length}')
+							print(f'\tnote {state["cur_note"]}, {note_length}', file=stream)
 
 	# -- render pret asm --
 
@@ -170,23 +176,23 @@ if __name__ == '__main__':
 	; from: {fami.file_name}
 	; on:   {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 	; ------------------------
-	''')
+	''', file=stream)
 	for i in range(len(channel_bins)):
 		channel = channel_bins[i]
 		
 		# add label
-		print(f'\n{nameify(song["name"])}_Ch{i+1}:')
+		print(f'\n{nameify(song["name"])}_Ch{i+1}:', file=stream)
 		
 		# add basic song config
 		if i == 0:
-			print(f'\ttempo {int(to_tempo(bpmify(song["speed"], song["tempo"])))}')
+			print(f'\ttempo {int(to_tempo(bpmify(song["speed"], song["tempo"])))}', file=stream)
 		elif i == 3:
-			print(f'\ttoggle_noise 0 ; delete this line if on pokered/pokeyellow')
-			print(f'\tdrum_speed 12')
+			print(f'\ttoggle_noise 0 ; delete this line if on pokered/pokeyellow', file=stream)
+			print(f'\tdrum_speed 12', file=stream)
 		
 		if 0 <= i < 2:
-			print(f'\tnote_type 12, 12, 8 ; fallback')
-			print(f'\tduty_cycle 0 ; fallback')
+			print(f'\tnote_type 12, 12, 8 ; fallback', file=stream)
+			print(f'\tduty_cycle 0 ; fallback', file=stream)
 		# add frames
 		for frame in channel['frames']:
 			frame_found = False
@@ -196,12 +202,12 @@ if __name__ == '__main__':
 					if pattern.index == frame:
 						frame_found = True
 			if frame_found:
-				print(f'\tsound_call .pattern_{frame}')
-		print('\tsound_ret')
+				print(f'\tsound_call .pattern_{frame}', file=stream)
+		print('\tsound_ret', file=stream)
 		
 		# create patterns
 		for pattern in channel['patterns']:
-			print(f'.pattern_{pattern.index}')
+			print(f'.pattern_{pattern.index}', file=stream)
 			state = {
 				"song_title": song["name"],
 				"channel": i,
@@ -218,7 +224,7 @@ if __name__ == '__main__':
 			
 			#if i < 3:
 				# XXX: note_type doublings!!
-				#print(f'\tnote_type 12, {state["prev_volume"]}, {to_gb_env(state["prev_envelope"])} ; fallback')
+				#print(f'\tnote_type 12, {state["prev_volume"]}, {to_gb_env(state["prev_envelope"])} ; fallback', file=stream)
 			
 			# -- render out individual rows --
 			for rn_ in range(len(pattern.content)):
@@ -250,12 +256,20 @@ if __name__ == '__main__':
 							if rest_length > 16:
 								tmp_counter = rest_length
 								while tmp_counter - 16 > 0:
-									print(f'\trest 16')
+									print(f'\trest 16', file=stream)
 									tmp_counter = tmp_counter - 16
-								print(f'\trest {tmp_counter}')
+								print(f'\trest {tmp_counter}', file=stream)
 							else:
-								print(f'\trest {rest_length}')
+								print(f'\trest {rest_length}', file=stream)
 					if prev_row is not None:
 						render_row(prev_row, this_row, state)
 					prev_row = this_row
-			print('\tsound_ret')
+			print('\tsound_ret', file=stream)
+
+def convert_file(file_name, stream=None):
+	fami = FamitrackerModule()
+	fami.load_from_file(file_name)
+	return convert(fami, stream)
+
+if __name__ == '__main__':
+	convert_file(sys.argv[1], sys.stdout)
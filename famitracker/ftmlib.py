@@ -6,9 +6,22 @@ modules created with current stable 0.4.6.
 '''
 
 import io, os
+from collections import namedtuple
 
 FTM_MAGIC  = b'FamiTracker Module'
 
+# blocks needed to fill in a FamitrackerModuleSummary
+PROBE_BLOCKS = ('PARAMS', 'INFO', 'HEADER', 'FRAMES')
+
+# expansion chip bits in the PARAMS block
+EXPANSION_CHIPS = ['VRC6', 'VRC7', 'FDS', 'MMC5', 'N163', 'S5B']
+
+# basic module information, as returned by FamitrackerModule.probe
+FamitrackerModuleSummary = namedtuple(
+	"FamitrackerModuleSummary",
+	["name", "author", "version", "chips", "channels", "order_length"]
+)
+
 read_bytes = lambda x, y: int.from_bytes(x.read(y), 'little')
 read_big = lambda x, y: int.from_bytes(x.read(y), 'big')
 
@@ -83,11 +96,16 @@ class FamitrackerModuleBlock:
 		self.name = b''
 		self.version = 0
 	
-	def load_from_stream(self, stream):
+	def load_from_stream(self, stream, only_names=None):
+		# only_names: if given and this block's name isn't in there,
+		# the block's data is skipped over instead of read
 		self.name = stream.read(16).decode('ascii').strip('\x00')
 		self.version = read_bytes(stream, 4)
 		size = read_bytes(stream, 4)
-		self.data = io.BytesIO(stream.read(size))
+		if (only_names is not None) and (self.name not in only_names):
+			stream.seek(size, os.SEEK_CUR)
+		else:
+			self.data = io.BytesIO(stream.read(size))
 		return self
 	
 	def load_from_bytes(self, bytes):
@@ -109,6 +127,10 @@ class FamitrackerModule:
 				"title": '',
 				"version": 'N/A'
 			},
+			"params": {
+				"expansion": 0,
+				"channels": 0
+			},
 			"songs": [],
 			"sequences": [
 			],
@@ -116,7 +138,9 @@ class FamitrackerModule:
 			],
 		}
 	
-	def load_from_stream(self, ftm):
+	def load_from_stream(self, ftm, only_blocks=None):
+		# only_blocks: if given, a list of block names to load, every other
+		# block is skipped over
 		struct = self.module
 		
 		# check for magic number
@@ -157,17 +181,22 @@ class FamitrackerModule:
 		# add blocks
 		blocks = {}
 		while True:
-			block = FamitrackerModuleBlock().load_from_stream(ftm)
+			block = FamitrackerModuleBlock().load_from_stream(ftm, only_blocks)
 			# stop loading blocks when reached EOF or invalid block
 			if (block.name == 'END') or (block.name == ''):
 				break
-			blocks[block.name] = block
+			if block.data is not None:
+				blocks[block.name] = block
 		
 		# parse blocks
 		for block_name, block in blocks.items():
 			if block_name == 'PARAMS':
-				# TODO
-				pass
+				# TODO: the rest of it
+				if block.version == 1:
+					read_bytes(block.data, 4) # song speed
+				else:
+					struct['params']['expansion'] = read_bytes(block.data, 1)
+				struct['params']['channels'] = read_bytes(block.data, 4)
 			
 			elif block_name == 'INFO':
 				struct['meta']['title'] = block.data.read(32).decode('ascii').strip('\x00')
@@ -278,6 +307,29 @@ class FamitrackerModule:
 		with open(file_name, "rb") as ftm_in:
 			return self.load_from_bytes(ftm_in.read())
 	
+	def probe(file_name):
+		# Reads only the blocks needed for a FamitrackerModuleSummary,
+		# and returns one. Does not need instantiation to be run.
+		fami = FamitrackerModule()
+		with open(file_name, "rb") as ftm_in:
+			fami.load_from_stream(ftm_in, only_blocks=PROBE_BLOCKS)
+		
+		expansion = fami.module['params']['expansion']
+		chips = ['2A03']
+		for i in range(len(EXPANSION_CHIPS)):
+			if expansion & (1 << i):
+				chips.append(EXPANSION_CHIPS[i])
+		
+		songs = fami.get_songs()
+		return FamitrackerModuleSummary(
+			name=fami.get_title(),
+			author=fami.get_author(),
+			version=fami.get_version(),
+			chips=tuple(chips),
+			channels=fami.module['params']['channels'],
+			order_length=len(songs[0]['frames']) if songs else 0
+		)
+	
 	# shortcuts
 	def get_version(self): return self.module["meta"]["version"] or 'N/A'
 	def get_title(self):   return self.module["meta"]["title"] or ''
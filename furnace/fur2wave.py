@@ -0,0 +1,43 @@
+import sys
+import os
+from furnacelib import FurnaceModule
+from furnacelib.tools import pack_gb_waves
+
+if __name__ == "__main__":
+	if len(sys.argv) < 2:
+		print("fur2wave.py [fur files...] > [asm file]")
+		print()
+		print("Converts the wavetables of one or more .fur modules into a")
+		print("wave sample table for the GB/GBC Pokemon disassemblies")
+		print()
+		print("- Wavetables are resampled to 32 steps and scaled to 4 bits")
+		print("- Identical waves are only included once")
+		exit(0)
+
+	wavetables = []
+	owners = [] # (file name, wave number) for each wavetable
+	for file_name in sys.argv[1:]:
+		with FurnaceModule(file_name=file_name, lazy=True) as module:
+			for wave_number, wave in enumerate(module.wavetables):
+				wavetables.append(wave)
+				owners.append((file_name, wave_number))
+
+	# NumPy gets used if it's there
+	waves, wave_ids = pack_gb_waves(wavetables, use_numpy=True)
+
+	# which wave number in each module became which wave sample
+	print("; Replace the wave numbers used in each module's note_type")
+	print("; commands with these")
+	for file_name in sys.argv[1:]:
+		mapping = [
+			"%d -> %d" % (owner[1], wave_id)
+			for owner, wave_id in zip(owners, wave_ids)
+			if owner[0] == file_name
+		]
+		print("; %s: %s" % (os.path.basename(file_name), ", ".join(mapping) or "no wavetables"))
+	print()
+
+	print("WaveSamples:")
+	for wave_id, wave in enumerate(waves):
+		print("\t; %d" % wave_id)
+		print("\tdn %s" % ", ".join("%2d" % i for i in wave))
@@ -1,6 +1,8 @@
-from .module import FurnaceModule
+from .module import FurnaceModule, FurnaceModuleSummary
 from .instrument import FurnaceInstrument
 from .wavetable import FurnaceWavetable
 from .sample import FurnaceSample
-from .pattern import FurnacePattern
+from .pattern import FurnacePattern, FurnacePatternColumns, FurnacePatternRow
 from .types import FurnaceChip, FurnaceNote, FurnaceInstrumentType, FurnaceMacroItem, FurnaceSampleType
+from .lazy import LazySectionList
+from .stream import MemoryStream, InflateStream
@@ -2,7 +2,23 @@ import zlib
 import io
 from copy import deepcopy
 from .util import read_as, read_as_single, write_as
-from .types import FurnaceChip, FurnaceNote, FurnaceInstrumentType, FurnaceMacroItem
+from .types import FurnaceChip, FurnaceNote, FurnaceInstrumentType, FurnaceMacroItem, INSTRUMENT_TYPE_TABLE, decode_enum
+
+# macro names, in the order they're stored
+STD_MACROS = ("volume", "arp", "duty", "wave")
+STD_MACROS_17 = ("pitch", "x1", "x2", "x3") # version 17+
+FM_MACROS = ("alg", "feedback", "fms", "ams") # version 29+
+OP_MACROS = (
+    "am", "ar", "dr", "mult", "rr", "sl", "tl", "dt2", "rs", "dt", "d2r", "ssgEnv"
+)
+EX_OP_MACROS = ("dam", "dvb", "egt", "ksl", "sus", "vib", "ws", "ksr")
+EX_MACROS = ("leftPan", "rightPan", "phaseReset", "x4", "x5", "x6", "x7", "x8")
+
+def read_macro(format, length, stream):
+    """
+    Reads a whole macro (`length` values of a `read_as` format) at once.
+    """
+    return list( read_as("%d%s" % (length, format), stream) )
 
 # Older Furnace instrument type (< 127)
  
@@ -229,44 +245,22 @@ class FurnaceInstrument:
 
     def __read_op_macros(self, stream):
         self.data["macros"]["ops"] = []
-        op_macro_lengths = {
-            "am": [],
-            "ar": [],
-            "dr": [],
-            "mult": [],
-            "rr": [],
-            "sl": [],
-            "tl": [],
-            "dt2": [],
-            "rs": [],
-            "dt": [],
-            "d2r": [],
-            "ssgEnv": []
-        }
-        op_macro_loops = {}
-        for i in op_macro_lengths:
-            op_macro_loops[i] = []
 
-        # read the actual macros
+        # lengths and loops of every operator come first
+        op_macro_lengths = []
+        op_macro_loops = []
         for op in range(4):
-            for i in op_macro_lengths:
-                op_macro_lengths[i].append( read_as_single("i", stream) )
-            for i in op_macro_lengths:
-                op_macro_loops[i].append( read_as_single("i", stream) )
+            op_macro_lengths.append( read_as("12i", stream) )
+            op_macro_loops.append( read_as("12i", stream) )
             # XXX: skip open
             stream.read(12)
 
         for op in range(4):
             new_op = {}
-            for i in op_macro_lengths:
-                new_op[i] = []
-            for i in op_macro_lengths:
-                for j in range( op_macro_lengths[i][op] ):
-                    new_op[i].append( read_as_single("b", stream) )
-            for i in op_macro_loops:
-                selected = op_macro_loops[i][op]
-                if selected > -1:
-                    new_op[i].insert(selected, FurnaceMacroItem.LOOP)
+            for i, name in enumerate(OP_MACROS):
+                new_op[name] = read_macro("b", op_macro_lengths[op][i], stream)
+                if op_macro_loops[op][i] > -1:
+                    new_op[name].insert(op_macro_loops[op][i], FurnaceMacroItem.LOOP)
             self.data["macros"]["ops"].append(new_op)
     
     def __save_op_macros(self, stream):
@@ -311,20 +305,9 @@ class FurnaceInstrument:
 # Release points
 
     def __read_release_points(self, stream):
-        release_points = {
-            "volume": read_as_single("i", stream),
-            "arp": read_as_single("i", stream),
-            "duty": read_as_single("i", stream),
-            "wave": read_as_single("i", stream),
-            "pitch": read_as_single("i", stream),
-            "x1": read_as_single("i", stream),
-            "x2": read_as_single("i", stream),
-            "x3": read_as_single("i", stream),
-            "alg": read_as_single("i", stream),
-            "feedback": read_as_single("i", stream),
-            "fms": read_as_single("i", stream),
-            "ams": read_as_single("i", stream)
-        }
+        release_points = dict(zip(
+            STD_MACROS + STD_MACROS_17 + FM_MACROS, read_as("12i", stream)
+        ))
         for i in release_points:
             if release_points[i] > -1:
                 self.data["macros"][i].insert(release_points[i], FurnaceMacroItem.RELEASE)
@@ -343,29 +326,13 @@ class FurnaceInstrument:
 # Operator release points
 
     def __read_op_release_points(self, stream):
-        op_macro_releases = {
-            "am": [],
-            "ar": [],
-            "dr": [],
-            "mult": [],
-            "rr": [],
-            "sl": [],
-            "tl": [],
-            "dt2": [],
-            "rs": [],
-            "dt": [],
-            "d2r": [],
-            "ssgEnv": []
-        }
-        for op in range(4):
-            for i in op_macro_releases:
-                op_macro_releases[i].append( read_as_single("i", stream) )
+        op_macro_releases = [read_as("12i", stream) for op in range(4)]
 
         for op in range(4):
-            for i in op_macro_releases:
-                selected = op_macro_releases[i][op]
+            for i, name in enumerate(OP_MACROS):
+                selected = op_macro_releases[op][i]
                 if selected > -1:
-                    self.data["macros"]["ops"][op][i].insert(selected, FurnaceMacroItem.LOOP)
+                    self.data["macros"]["ops"][op][name].insert(selected, FurnaceMacroItem.LOOP)
 
     def __save_op_release_points(self, stream):
         macro_rel_names = [\
@@ -383,47 +350,27 @@ class FurnaceInstrument:
 # Extended Operator macros
 
     def __read_ex_op_macros(self, stream):
-        op_macro_lengths = {
-            "dam": [],
-            "dvb": [],
-            "egt": [],
-            "ksl": [],
-            "sus": [],
-            "vib": [],
-            "ws": [],
-            "ksr": []
-        }
-        op_macro_loops = {}
-        op_macro_releases = {}
-        for i in op_macro_lengths:
-            op_macro_loops[i] = []
-            op_macro_releases[i] = []
-
-        # read the actual macros
+        # lengths, loops and releases of every operator come first
+        op_macro_lengths = []
+        op_macro_loops = []
+        op_macro_releases = []
         for op in range(4):
-            for i in op_macro_lengths:
-                op_macro_lengths[i].append( read_as_single("i", stream) )
-            for i in op_macro_lengths:
-                op_macro_loops[i].append( read_as_single("i", stream) )
-            for i in op_macro_lengths:
-                op_macro_releases[i].append( read_as_single("i", stream) )
+            op_macro_lengths.append( read_as("8i", stream) )
+            op_macro_loops.append( read_as("8i", stream) )
+            op_macro_releases.append( read_as("8i", stream) )
             # XXX: skip open
             stream.read(8)
 
         for op in range(4):
-            for i in op_macro_lengths:
-                self.data["macros"]["ops"][op][i] = []
-            for i in op_macro_lengths:
-                for j in range( op_macro_lengths[i][op] ):
-                    self.data["macros"]["ops"][op][i].append( read_as_single("b", stream) )
-            for i in op_macro_loops:
-                selected = op_macro_loops[i][op]
-                if selected > -1:
-                    self.data["macros"]["ops"][op][i].insert(selected, FurnaceMacroItem.LOOP)
-            for i in op_macro_releases:
-                selected = op_macro_releases[i][op]
-                if selected > -1:
-                    self.data["macros"]["ops"][op][i].insert(selected, FurnaceMacroItem.RELEASE)
+            macros = self.data["macros"]["ops"][op]
+            for i, name in enumerate(EX_OP_MACROS):
+                macros[name] = read_macro("b", op_macro_lengths[op][i], stream)
+            for i, name in enumerate(EX_OP_MACROS):
+                if op_macro_loops[op][i] > -1:
+                    macros[name].insert(op_macro_loops[op][i], FurnaceMacroItem.LOOP)
+            for i, name in enumerate(EX_OP_MACROS):
+                if op_macro_releases[op][i] > -1:
+                    macros[name].insert(op_macro_releases[op][i], FurnaceMacroItem.RELEASE)
 
     def __save_ex_op_macros(self, stream):
         for opdata in self.data["macros"]["ops"]:
@@ -496,12 +443,8 @@ class FurnaceInstrument:
     def __read_ex_sample_data(self, stream):
         self.data["sampleEx"] = []
         if read_as_single("b", stream) != 0:
-            frequency = []
-            sample = []
-            for i in range(120):
-                frequency.append( read_as_single("i", stream) )
-            for i in range(120):
-                sample.append( read_as_single("h", stream) )
+            frequency = read_as("120i", stream)
+            sample = read_as("120h", stream)
 
             for i in range(120):
                 self.data["sampleEx"].append(
@@ -543,29 +486,14 @@ class FurnaceInstrument:
 # Extended macros
 
     def __read_ex_macros(self, stream):
-        ex_macros_length = {
-            "leftPan": read_as_single("i", stream),
-            "rightPan": read_as_single("i", stream),
-            "phaseReset": read_as_single("i", stream),
-            "x4": read_as_single("i", stream),
-            "x5": read_as_single("i", stream),
-            "x6": read_as_single("i", stream),
-            "x7": read_as_single("i", stream),
-            "x8": read_as_single("i", stream),
-        }
-        ex_macros_loop = {}
-        ex_macros_release = {}
-        for i in ex_macros_length:
-            ex_macros_loop[i] = read_as_single("i", stream)
-        for i in ex_macros_length:
-            ex_macros_release[i] = read_as_single("i", stream)
+        ex_macros_length = dict(zip(EX_MACROS, read_as("8i", stream)))
+        ex_macros_loop = dict(zip(EX_MACROS, read_as("8i", stream)))
+        ex_macros_release = dict(zip(EX_MACROS, read_as("8i", stream)))
         # XXX skip open
         stream.read(8)
 
         for i in ex_macros_length:
-            self.data["macros"][i] = []
-            for j in range( ex_macros_length[i] ):
-                self.data["macros"][i].append( read_as_single("i", stream) )
+            self.data["macros"][i] = read_macro("i", ex_macros_length[i], stream)
             if ex_macros_loop[i] > -1:
                 self.data["macros"][i].insert( ex_macros_loop[i], FurnaceMacroItem.LOOP )
             if ex_macros_release[i] > -1:
@@ -628,8 +556,7 @@ class FurnaceInstrument:
         # XXX skip open
         stream.read(3)
 
-        for i in range(32):
-            self.data["fds"]["modTable"].append( read_as_single("b", stream) )
+        self.data["fds"]["modTable"] = read_macro("b", 32, stream)
 
     def __save_fds_data(self, stream):
         write_as("iibbbb",
@@ -706,7 +633,7 @@ class FurnaceInstrument:
 
         stream.read(4) # reserved
         self.version = read_as_single("H", stream)
-        self.type = FurnaceInstrumentType(stream.read(1)[0])
+        self.type = decode_enum(INSTRUMENT_TYPE_TABLE, FurnaceInstrumentType, stream.read(1)[0])
         stream.read(1) # reserved
         self.name = read_as("string", stream)
 
@@ -739,27 +666,8 @@ class FurnaceInstrument:
 
         self.data["fm"]["ops"] = []
         for op in range(4):
-            new_op = {}
-            new_op["am"]        = read_as_single("B", stream)
-            new_op["ar"]        = read_as_single("B", stream)
-            new_op["dr"]        = read_as_single("B", stream)
-            new_op["mult"]      = read_as_single("B", stream)
-            new_op["rr"]        = read_as_single("B", stream)
-            new_op["sl"]        = read_as_single("B", stream)
-            new_op["tl"]        = read_as_single("B", stream)
-            new_op["dt2"]       = read_as_single("B", stream)
-            new_op["rs"]        = read_as_single("B", stream)
-            new_op["dt"]        = read_as_single("B", stream)
-            new_op["d2r"]       = read_as_single("B", stream)
-            new_op["ssgEnv"]    = read_as_single("B", stream)
-            new_op["dam"]       = read_as_single("B", stream)
-            new_op["dvb"]       = read_as_single("B", stream)
-            new_op["egt"]       = read_as_single("B", stream)
-            new_op["ksl"]       = read_as_single("B", stream)
-            new_op["sus"]       = read_as_single("B", stream)
-            new_op["vib"]       = read_as_single("B", stream)
-            new_op["ws"]        = read_as_single("B", stream)
-            new_op["ksr"]       = read_as_single("B", stream)
+            # the operator parameters are named after their macros
+            new_op = dict(zip(OP_MACROS + EX_OP_MACROS, read_as("20B", stream)))
             stream.read(12) # reserved
 
             self.data["fm"]["ops"].append(new_op)
@@ -910,31 +818,12 @@ class FurnaceInstrument:
     def __read_standard(self, stream):
         self.data["macros"] = {}
 
-        std_macro_lengths = {
-            "volume": read_as_single("i", stream),
-            "arp": read_as_single("i", stream),
-            "duty": read_as_single("i", stream),
-            "wave": read_as_single("i", stream),
-        }
-        
+        names = STD_MACROS
         if self.version >= 17:
-            std_macro_lengths["pitch"] = read_as_single("i", stream)
-            std_macro_lengths["x1"]    = read_as_single("i", stream)
-            std_macro_lengths["x2"]    = read_as_single("i", stream)
-            std_macro_lengths["x3"]    = read_as_single("i", stream)
-        
-        std_macro_loops = {
-            "volume": read_as_single("i", stream),
-            "arp": read_as_single("i", stream),
-            "duty": read_as_single("i", stream),
-            "wave": read_as_single("i", stream),
-        }
-        
-        if self.version >= 17:
-            std_macro_loops["pitch"] = read_as_single("i", stream)
-            std_macro_loops["x1"]    = read_as_single("i", stream)
-            std_macro_loops["x2"]    = read_as_single("i", stream)
-            std_macro_loops["x3"]    = read_as_single("i", stream)
+            names = STD_MACROS + STD_MACROS_17
+
+        std_macro_lengths = dict(zip(names, read_as("%di" % len(names), stream)))
+        std_macro_loops = dict(zip(names, read_as("%di" % len(names), stream)))
 
         arp_macro_mode = read_as_single("b", stream)
 
@@ -952,35 +841,21 @@ class FurnaceInstrument:
         std_macros = {}
 
         for key in std_macro_lengths:
-            std_macros[key] = []
-            for i in range(std_macro_lengths[key]):
-                value = read_as_single("i", stream)
-                if key == "arp": # TODO: check this
-                    if self.version < 31:
-                        value -= 12
-                std_macros[key].append( value )
+            std_macros[key] = read_macro("i", std_macro_lengths[key], stream)
+            if key == "arp": # TODO: check this
+                if self.version < 31:
+                    std_macros[key] = [i - 12 for i in std_macros[key]]
 
         if self.version >= 29:
-            std_macro_lengths = {
-                "alg": read_as_single("i", stream),
-                "feedback": read_as_single("i", stream),
-                "fms": read_as_single("i", stream),
-                "ams": read_as_single("i", stream),
-            }
-            std_macro_loops["alg"] = read_as_single("i", stream)
-            std_macro_loops["feedback"] = read_as_single("i", stream)
-            std_macro_loops["fms"] = read_as_single("i", stream)
-            std_macro_loops["ams"] = read_as_single("i", stream)
+            std_macro_lengths = dict(zip(FM_MACROS, read_as("4i", stream)))
+            std_macro_loops.update(zip(FM_MACROS, read_as("4i", stream)))
 
             # XXX skip macro open for now
             stream.read(12)
 
             # reread new macros
             for key in std_macro_lengths:
-                std_macros[key] = []
-                for i in range(std_macro_lengths[key]):
-                    value = read_as_single("i", stream)
-                    std_macros[key].append( value )
+                std_macros[key] = read_macro("i", std_macro_lengths[key], stream)
 
         for i in std_macros:
             if std_macro_loops[i] > -1:
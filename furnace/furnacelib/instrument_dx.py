@@ -1,9 +1,9 @@
 import zlib
 import io
 from copy import deepcopy
-from .util import read_as, read_as_single, write_as
-from .types import FurnaceChip, FurnaceNote, FurnaceInstrumentType, FurnaceMacroItem, FurnaceMacroType, FurnaceMacroCode, FurnaceMacroSize
-import struct
+from .util import read_as, read_as_single, write_as, codec, STRING_ENCODING
+from .types import FurnaceChip, FurnaceNote, FurnaceInstrumentType, FurnaceMacroItem, FurnaceMacroType, FurnaceMacroCode, FurnaceOpMacroCode, FurnaceMacroSize
+from .types import MACRO_CODE_TABLE, OP_MACRO_CODE_TABLE, MACRO_TYPE_TABLE, MACRO_SIZE_TABLE, INSTRUMENT_TYPE_TABLE, decode_enum
 
 # Newer Furnace instrument type (>= 127)
 
@@ -15,6 +15,9 @@ class FurnaceInstrumentDX:
         self.name = None
         self.wavetables = []
         self.samples = []
+        self.__features = {}
+        # (block, code) for each block in `data` when it was indexed
+        self.__indexed = None
         
         if make_new:
             self.make_new()
@@ -31,12 +34,57 @@ class FurnaceInstrumentDX:
         self.__read_header(stream)
         self.__read_features(stream)
 
+    def save_to_stream(self, stream):
+        features = b"".join(i.serialize() for i in self.data)
+        # (a block's contents could just happen to end with "EN" too)
+        if not (self.data and self.data[-1].code == "EN"):
+            features += FuiDXFeatureBlock(code="EN").serialize()
+        stream.write(b"INS2")
+        write_as("IHH", (len(features) + 4, self.version, self.type.value), stream)
+        stream.write(features)
+
+    @property
+    def features(self):
+        """
+        A `dict` from feature code ("GB", "MA", "NA"...) to the list of
+        blocks in `data` with that code.
+
+        It's rebuilt whenever the blocks in `data` (or their codes) have
+        changed since it was last built.
+        """
+        if not self.__index_is_current():
+            self.index_features()
+        return self.__features
+
+    def index_features(self):
+        features = {}
+        for block in self.data:
+            features.setdefault(block.code, []).append(block)
+        self.__features = features
+        self.__indexed = [(block, block.code) for block in self.data]
+
+    def __index_is_current(self):
+        # there's only a handful of blocks, so they're just all compared
+        if (self.__indexed is None) or (len(self.__indexed) != len(self.data)):
+            return False
+        return all(
+            (block is indexed) and (block.code == code)
+            for block, (indexed, code) in zip(self.data, self.__indexed)
+        )
+
+    def get_feature(self, code):
+        """
+        The first block with a feature code, or None if there isn't one.
+        """
+        blocks = self.features.get(code)
+        return blocks[0] if blocks else None
+
     def __read_header(self, stream):
         if stream.read(4) != b"INS2":
             raise Exception("Not an instrument?")
         stream.read(4) # skip size
         self.version = read_as_single("H", stream)
-        self.type = FurnaceInstrumentType(read_as_single("H", stream))
+        self.type = decode_enum(INSTRUMENT_TYPE_TABLE, FurnaceInstrumentType, read_as_single("H", stream))
     
     def __read_features(self, stream):
         while True:
@@ -55,143 +103,540 @@ class FurnaceInstrumentDX:
         return "<Furnace dev127+ %s instrument '%s'>" % (
             self.type, self.name)
 
+# Feature block codecs
+#
+# Each decoder turns the raw contents of a block into what
+# `FuiDXFeatureBlock.interpret_data` returns, and each encoder turns that
+# back into the exact same bytes. Bits and trailing bytes that aren't
+# understood yet are kept in "reservedBits" and "extra".
+
+def _enum_or_value(table, enum, value):
+    try:
+        return decode_enum(table, enum, value)
+    except ValueError:
+        return value
+
+def _value_of(item):
+    return getattr(item, "value", item)
+
+def _unpack_bits(value, fields, out):
+    # `fields` is ((name, shift, width), ...); returns the bits left over
+    covered = 0
+    for name, shift, width in fields:
+        mask = (1 << width) - 1
+        out[name] = (value >> shift) & mask
+        covered |= mask << shift
+    return value & ~covered
+
+def _pack_bits(values, fields, leftover=0):
+    value = leftover
+    for name, shift, width in fields:
+        value |= (int(values[name]) & ((1 << width) - 1)) << shift
+    return value
+
+class FixedLayout:
+    """
+    Codec for feature blocks made up of fixed fields. Each field is either
+    (format, name), where formats with a count (e.g. "32b") give lists, or
+    (format, ((name, shift, width), ...)) for bitfields.
+
+    Blocks from older versions can stop early, in which case only the
+    fields that are there get decoded (and encoded back).
+    """
+    def __init__(self, *fields):
+        self.fields = fields
+        self.codecs = [codec(i[0]) for i in fields]
+        self.counts = [len(i.unpack(bytes(i.size))) for i in self.codecs]
+        self.whole = codec("".join(i[0] for i in fields))
+
+    def decode(self, data):
+        if len(data) >= self.whole.size:
+            values = self.whole.unpack_from(data)
+            used = len(self.fields)
+            offset = self.whole.size
+        else:
+            values = []
+            used = 0
+            offset = 0
+            for compiled in self.codecs:
+                if offset + compiled.size > len(data):
+                    break
+                values.extend(compiled.unpack_from(data, offset))
+                offset += compiled.size
+                used += 1
+
+        result = {}
+        reserved = {}
+        position = 0
+        for i in range(used):
+            target = self.fields[i][1]
+            field = values[position:position + self.counts[i]]
+            position += self.counts[i]
+            if isinstance(target, str):
+                result[target] = field[0] if self.counts[i] == 1 else list(field)
+            else:
+                leftover = _unpack_bits(field[0], target, result)
+                if leftover:
+                    reserved[i] = leftover
+        if reserved:
+            result["reservedBits"] = reserved
+        result["extra"] = bytes(data[offset:])
+        return result
+
+    def encode(self, value):
+        reserved = value.get("reservedBits", {})
+        packed = []
+        for i, (format, target) in enumerate(self.fields):
+            if isinstance(target, str):
+                if target not in value:
+                    break
+                field = value[target]
+                field = (field,) if self.counts[i] == 1 else field
+            else:
+                if target[0][0] not in value:
+                    break
+                field = (_pack_bits(value, target, reserved.get(i, 0)),)
+            packed.append(self.codecs[i].pack(*field))
+        return b"".join(packed) + value.get("extra", b"")
+
+# word sizes of macro values
+MACRO_FORMATS = {
+    FurnaceMacroSize.UINT8: "B",
+    FurnaceMacroSize.INT8: "b",
+    FurnaceMacroSize.INT16: "h",
+    FurnaceMacroSize.INT32: "i",
+}
+MACRO_HEADER = codec("BBBBBBBB")
+MACRO_OPEN_BITS = (("open", 0, 1), ("type", 1, 2), ("wordSize", 6, 2))
+
+def _insert_markers(values, loop, release):
+    items = list(values)
+    if loop != 255:
+        items.insert(loop, FurnaceMacroItem.LOOP)
+    if release != 255:
+        items.insert(release, FurnaceMacroItem.RELEASE)
+    return items
+
+class MacroCodec:
+    """
+    Codec for macro blocks (MA, and O1-O4 for each FM operator), which
+    are a list of macros ending with a `STOP` entry. The `STOP` entry
+    also holds the header length and anything after the list.
+
+    Sequence macros have their loop and release points put into `data`
+    as `FurnaceMacroItem`s. When encoding, those markers are used if
+    they've been moved; otherwise `loop` and `release` are.
+    """
+    def __init__(self, kinds, kind_table):
+        self.kinds = kinds
+        self.kind_table = kind_table
+
+    def decode(self, data):
+        header_length = codec("H").unpack_from(data)[0]
+        offset = 2
+        macro_list = []
+        while True:
+            kind = _enum_or_value(self.kind_table, self.kinds, data[offset])
+            if _value_of(kind) == 255:
+                macro_list.append({
+                    "kind": kind,
+                    "headerLength": header_length,
+                    "extra": bytes(data[offset + 1:])
+                })
+                return macro_list
+            kind, length, loop, release, mode, open_type_word, delay, speed = \
+                MACRO_HEADER.unpack_from(data, offset)
+            new_macro = {"kind": _enum_or_value(self.kind_table, self.kinds, kind)}
+            bits = {}
+            new_macro["openFlags"] = _unpack_bits(open_type_word, MACRO_OPEN_BITS, bits)
+            new_macro["open"] = bits["open"]
+            new_macro["type"] = _enum_or_value(MACRO_TYPE_TABLE, FurnaceMacroType, bits["type"])
+            new_macro["wordSize"] = decode_enum(MACRO_SIZE_TABLE, FurnaceMacroSize, bits["wordSize"])
+            new_macro["delay"] = delay
+            new_macro["speed"] = speed
+            new_macro["loop"] = loop
+            new_macro["release"] = release
+            new_macro["mode"] = mode
+            offset += MACRO_HEADER.size
+            # newer versions might have a longer header
+            if header_length > MACRO_HEADER.size:
+                new_macro["headerExtra"] = bytes(data[offset:offset + header_length - MACRO_HEADER.size])
+                offset += header_length - MACRO_HEADER.size
+
+            values = codec("%d%s" % (length, MACRO_FORMATS[new_macro["wordSize"]]))
+            macro_data = list(values.unpack_from(data, offset))
+            offset += values.size
+            if new_macro["type"] == FurnaceMacroType.SEQUENCE:
+                macro_data = _insert_markers(macro_data, loop, release)
+            new_macro["data"] = macro_data
+            macro_list.append(new_macro)
+
+    def encode(self, macro_list):
+        stop = macro_list[-1]
+        header_length = stop.get("headerLength", MACRO_HEADER.size)
+        out = [codec("H").pack(header_length)]
+        for macro in macro_list[:-1]:
+            values = [i for i in macro["data"] if not isinstance(i, FurnaceMacroItem)]
+            loop = macro.get("loop", 255)
+            release = macro.get("release", 255)
+            if macro["type"] == FurnaceMacroType.SEQUENCE and \
+            _insert_markers(values, loop, release) != list(macro["data"]):
+                # the markers were moved, go by them instead
+                items = list(macro["data"])
+                release = 255
+                loop = 255
+                if FurnaceMacroItem.RELEASE in items:
+                    release = items.index(FurnaceMacroItem.RELEASE)
+                    del items[release]
+                if FurnaceMacroItem.LOOP in items:
+                    loop = items.index(FurnaceMacroItem.LOOP)
+            open_type_word = _pack_bits({
+                "open": macro["open"],
+                "type": _value_of(macro["type"]),
+                "wordSize": macro["wordSize"].value
+            }, MACRO_OPEN_BITS, macro.get("openFlags", 0))
+            out.append(MACRO_HEADER.pack(
+                _value_of(macro["kind"]), len(values), loop, release,
+                macro.get("mode", 0), open_type_word, macro["delay"], macro["speed"]
+            ))
+            out.append(macro.get("headerExtra", b""))
+            out.append(codec("%d%s" % (len(values), MACRO_FORMATS[macro["wordSize"]])).pack(*values))
+        out.append(codec("B").pack(_value_of(stop["kind"])))
+        out.append(stop.get("extra", b""))
+        return b"".join(out)
+
+class NameCodec:
+    """
+    Codec for the instrument name (NA).
+    """
+    def decode(self, data):
+        return read_as("string", io.BytesIO(data))
+
+    def encode(self, name):
+        return name.encode(STRING_ENCODING) + b"\x00"
+
+GB_ENVELOPE_BITS = (("volume", 0, 4), ("direction", 4, 1), ("length", 5, 3))
+GB_FLAG_BITS = (("softwareEnvelope", 0, 1), ("initEnvelope", 1, 1), ("doubleWave", 2, 1))
+
+class GameBoyCodec:
+    """
+    Codec for Game Boy instrument data (GB). The hardware sequence is
+    kept as raw 3-byte commands.
+    """
+    def decode(self, data):
+        envelope = {}
+        _unpack_bits(data[0], GB_ENVELOPE_BITS, envelope)
+        flags = {}
+        leftover = _unpack_bits(data[2], GB_FLAG_BITS, flags)
+        sequence_end = 4 + data[3] * 3
+        result = {
+            "envelope": envelope,
+            "soundLength": data[1],
+            "flags": dict((i, bool(flags[i])) for i in flags),
+            "sequence": [bytes(data[i:i + 3]) for i in range(4, sequence_end, 3)],
+            "extra": bytes(data[sequence_end:])
+        }
+        if leftover:
+            result["reservedBits"] = leftover
+        return result
+
+    def encode(self, value):
+        return bytes((
+            _pack_bits(value["envelope"], GB_ENVELOPE_BITS),
+            value["soundLength"],
+            _pack_bits(value["flags"], GB_FLAG_BITS, value.get("reservedBits", 0)),
+            len(value["sequence"])
+        )) + b"".join(value["sequence"]) + value.get("extra", b"")
+
+FM_FLAG_BITS = (("opCount", 0, 4), ("opEnabled", 4, 4))
+FM_BASE_BITS = (
+    (("alg", 4, 3), ("feedback", 0, 3)),
+    (("fms2", 5, 3), ("ams", 3, 2), ("fms", 0, 3)),
+    (("ams2", 6, 2), ("fourOp", 5, 1), ("opllPreset", 0, 5)),
+    (("block", 0, 4),),
+)
+FM_OP_BITS = (
+    (("ksr", 7, 1), ("dt", 4, 3), ("mult", 0, 4)),
+    (("sus", 7, 1), ("tl", 0, 7)),
+    (("rs", 6, 2), ("vib", 5, 1), ("ar", 0, 5)),
+    (("am", 7, 1), ("ksl", 5, 2), ("dr", 0, 5)),
+    (("egt", 7, 1), ("kvs", 5, 2), ("d2r", 0, 5)),
+    (("sl", 4, 4), ("rr", 0, 4)),
+    (("dvb", 4, 4), ("ssgEnv", 0, 4)),
+    (("dam", 5, 3), ("dt2", 3, 2), ("ws", 0, 3)),
+)
+
+class FMCodec:
+    """
+    Codec for FM instrument data (FM). The base data got longer over
+    time, so its length is worked out from the operator count.
+    """
+    def decode(self, data):
+        result = {}
+        reserved = {}
+        _unpack_bits(data[0], FM_FLAG_BITS, result)
+        base_length = len(data) - 1 - 8 * result["opCount"]
+        if base_length < 3:
+            raise Exception("Broken FM block")
+
+        for i in range(min(base_length, len(FM_BASE_BITS))):
+            leftover = _unpack_bits(data[1 + i], FM_BASE_BITS[i], result)
+            if leftover:
+                reserved[1 + i] = leftover
+        result["baseExtra"] = bytes(data[1 + len(FM_BASE_BITS):1 + base_length])
+
+        result["ops"] = []
+        offset = 1 + base_length
+        for op in range(result["opCount"]):
+            new_op = {}
+            for i in range(len(FM_OP_BITS)):
+                _unpack_bits(data[offset + i], FM_OP_BITS[i], new_op)
+            result["ops"].append(new_op)
+            offset += len(FM_OP_BITS)
+
+        if reserved:
+            result["reservedBits"] = reserved
+        return result
+
+    def encode(self, value):
+        reserved = value.get("reservedBits", {})
+        out = bytearray()
+        out.append(_pack_bits({
+            "opCount": len(value["ops"]), "opEnabled": value["opEnabled"]
+        }, FM_FLAG_BITS))
+        for i, bits in enumerate(FM_BASE_BITS):
+            if bits[0][0] not in value:
+                break
+            out.append(_pack_bits(value, bits, reserved.get(1 + i, 0)))
+        out += value.get("baseExtra", b"")
+        for op in value["ops"]:
+            for bits in FM_OP_BITS:
+                out.append(_pack_bits(op, bits))
+        return bytes(out)
+
+SM_FLAG_BITS = (("useNoteMap", 0, 1), ("useSample", 1, 1), ("useWave", 2, 1))
+SM_HEADER = codec("hBB")
+SM_NOTE_MAP = codec("240h")
+
+class SampleCodec:
+    """
+    Codec for sample instrument data (SM). The note map is a list of 120
+    (frequency, sample) pairs, only there if `useNoteMap` is set.
+    """
+    def decode(self, data):
+        init_sample, flags, wave_length = SM_HEADER.unpack_from(data)
+        result = {"initSample": init_sample, "waveLength": wave_length}
+        leftover = _unpack_bits(flags, SM_FLAG_BITS, result)
+        if leftover:
+            result["reservedBits"] = leftover
+        offset = SM_HEADER.size
+        result["noteMap"] = []
+        if result["useNoteMap"]:
+            note_map = SM_NOTE_MAP.unpack_from(data, offset)
+            result["noteMap"] = list(zip(note_map[0::2], note_map[1::2]))
+            offset += SM_NOTE_MAP.size
+        result["extra"] = bytes(data[offset:])
+        return result
+
+    def encode(self, value):
+        out = SM_HEADER.pack(
+            value["initSample"],
+            _pack_bits(value, SM_FLAG_BITS, value.get("reservedBits", 0)),
+            value["waveLength"]
+        )
+        if value["useNoteMap"]:
+            out += SM_NOTE_MAP.pack(*(i for pair in value["noteMap"] for i in pair))
+        return out + value.get("extra", b"")
+
+class ListCodec:
+    """
+    Codec for the sample and wavetable lists (SL, WL): which samples or
+    wavetables the instrument uses, and where they are in a .fui file.
+    """
+    def decode(self, data):
+        count = data[0]
+        ids = codec("%dB" % count)
+        pointers = codec("%dI" % count)
+        return {
+            "list": list(ids.unpack_from(data, 1)),
+            "pointers": list(pointers.unpack_from(data, 1 + ids.size)),
+            "extra": bytes(data[1 + ids.size + pointers.size:])
+        }
+
+    def encode(self, value):
+        count = len(value["list"])
+        return bytes((count,)) \
+            + codec("%dB" % count).pack(*value["list"]) \
+            + codec("%dI" % count).pack(*value["pointers"]) \
+            + value.get("extra", b"")
+
+# feature code -> codec, anything that isn't here is kept as raw data
+FEATURE_CODECS = {
+    "NA": NameCodec(),
+    "FM": FMCodec(),
+    "MA": MacroCodec(FurnaceMacroCode, MACRO_CODE_TABLE),
+    "64": FixedLayout(
+        ("B", (("triangle", 0, 1), ("saw", 1, 1), ("pulse", 2, 1), ("noise", 3, 1),
+               ("toFilter", 4, 1), ("volMacroAsCutoff", 5, 1), ("initFilter", 6, 1),
+               ("dutyIsAbs", 7, 1))),
+        ("B", (("lowPass", 0, 1), ("highPass", 1, 1), ("bandPass", 2, 1), ("ch3Off", 3, 1),
+               ("filterIsAbs", 4, 1), ("noTest", 5, 1), ("ringMod", 6, 1), ("oscSync", 7, 1))),
+        ("B", (("decay", 0, 4), ("attack", 4, 4))),
+        ("B", (("release", 0, 4), ("sustain", 4, 4))),
+        ("H", "duty"),
+        ("H", (("cutoff", 0, 12), ("resonance", 12, 4))),
+    ),
+    "GB": GameBoyCodec(),
+    "SM": SampleCodec(),
+    "O1": MacroCodec(FurnaceOpMacroCode, OP_MACRO_CODE_TABLE),
+    "O2": MacroCodec(FurnaceOpMacroCode, OP_MACRO_CODE_TABLE),
+    "O3": MacroCodec(FurnaceOpMacroCode, OP_MACRO_CODE_TABLE),
+    "O4": MacroCodec(FurnaceOpMacroCode, OP_MACRO_CODE_TABLE),
+    "LD": FixedLayout(
+        ("B", "fixedFreq"),
+        ("H", "kickFreq"),
+        ("H", "snareHiFreq"),
+        ("H", "tomTopFreq"),
+    ),
+    "SN": FixedLayout(
+        ("B", (("attack", 0, 4), ("decay", 4, 3))),
+        ("B", (("release", 0, 5), ("sustain", 5, 3))),
+        ("B", (("gainMode", 0, 3), ("sustainMode", 3, 1), ("useEnvelope", 4, 1))),
+        ("B", "gain"),
+    ),
+    "N1": FixedLayout(
+        ("i", "waveInit"),
+        ("b", "wavePos"),
+        ("b", "waveLen"),
+        ("b", "waveMode"),
+    ),
+    "FD": FixedLayout(
+        ("i", "modSpeed"),
+        ("i", "modDepth"),
+        ("B", "modInit"),
+        ("32b", "modTable"),
+    ),
+    "WS": FixedLayout(
+        ("i", "wave1"),
+        ("i", "wave2"),
+        ("B", "rateDiv"),
+        ("B", "effect"),
+        ("B", "enabled"),
+        ("B", "global"),
+        ("B", "speed"),
+        ("4B", "params"),
+    ),
+    "SL": ListCodec(),
+    "WL": ListCodec(),
+    "MP": FixedLayout(
+        ("B", "ar"),
+        ("B", "d1r"),
+        ("B", "dl"),
+        ("B", "d2r"),
+        ("B", "rr"),
+        ("B", "rc"),
+        ("B", "lfo"),
+        ("B", "vib"),
+        ("B", "am"),
+    ),
+    "SU": FixedLayout(
+        ("B", "switchRoles"),
+    ),
+    "ES": FixedLayout(
+        ("B", "filterMode"),
+        ("H", "k1"),
+        ("H", "k2"),
+        ("H", "envelopeCount"),
+        ("b", "leftVolumeRamp"),
+        ("b", "rightVolumeRamp"),
+        ("b", "k1Ramp"),
+        ("b", "k2Ramp"),
+        ("B", "k1Slow"),
+        ("B", "k2Slow"),
+    ),
+    "X1": FixedLayout(
+        ("i", "bankSlot"),
+    ),
+}
+
+def decode_feature(code, data):
+    """
+    Decodes the contents of a feature block, or returns None for blocks
+    that can't be decoded (yet).
+    """
+    if code not in FEATURE_CODECS:
+        return None
+    return FEATURE_CODECS[code].decode(memoryview(data).cast("B"))
+
+def encode_feature(code, value):
+    """
+    The opposite of `decode_feature`.
+    """
+    return FEATURE_CODECS[code].encode(value)
+
 class FuiDXFeatureBlock:
+    """
+    A single feature block of a dev127+ instrument. `data` is the raw
+    contents of the block; `interpret_data` decodes it, and the result is
+    kept until `data` (or `code`) is changed.
+    """
     def __init__(self, code="NA", data=b""):
         if len(code.encode('ascii')) != 2:
             raise Exception("Feature code must be 2 characters long!")
         self.code = code
         self.data = data
-    
+
+    @property
+    def data(self):
+        return self.__data
+
+    @data.setter
+    def data(self, data):
+        self.__data = data
+        self.__interpreted = None
+
     def from_stream(stream):
         code = stream.read(2).decode('ascii')
+        if code == "EN":
+            # the end marker has no size
+            return FuiDXFeatureBlock(code=code)
         size = read_as_single("H", stream)
         return FuiDXFeatureBlock(
             code=code,
             data=stream.read(size)
         )
 
+    def from_value(code, value):
+        """
+        Makes a block out of a decoded value (see `interpret_data`).
+
+        This method does not need instantiation to be run.
+        """
+        return FuiDXFeatureBlock(code=code, data=encode_feature(code, value))
+
     def serialize(self):
         if self.code == "EN":
             return b"EN"
-        else:
-            return 
-            pass
+        data = self.data
+        # changes made to the decoded value end up in the block
+        if (self.__interpreted is not None) and (self.__interpreted[0] == self.code) \
+        and (self.code in FEATURE_CODECS):
+            data = encode_feature(self.code, self.__interpreted[1])
+        return self.code.encode("ascii") + codec("H").pack(len(data)) + data
 
     def interpret_data(self):
-    # this will return a string or a dict
-    # same format as before
-        data = io.BytesIO(self.data)
-        if self.code == "EN":
-            return # EOF
-        elif self.code == "NA":
-            return read_as("string", data)
-        elif self.code == "FM":
-            return # TODO
-        elif self.code == "MA":
-            macro_list = []
-            header_len = read_as_single("H", data)
-            while True:
-                new_macro = {}
-                new_macro["kind"] = FurnaceMacroCode(read_as_single("B", data))
-                if new_macro["kind"] == FurnaceMacroCode.STOP:
-                    macro_list.append(new_macro)
-                    return macro_list
-                length = read_as_single("B", data)
-                loop = read_as_single("B", data)
-                release = read_as_single("B", data)
-                mode = read_as_single("B", data)
-                open_type_word = read_as_single("B", data)
-                new_macro["open"] = open_type_word & 0b1
-                new_macro["type"] = FurnaceMacroType((open_type_word & 0b110) >> 1)
-                new_macro["wordSize"] = FurnaceMacroSize((open_type_word & 0b11000000) >> 6)
-                new_macro["delay"] = read_as_single("B", data)
-                new_macro["speed"] = read_as_single("B", data)
-                macro_data = []
-                for i in range(length):
-                    entry = data.read(new_macro["wordSize"].num_bytes)
-                    if new_macro["wordSize"] == FurnaceMacroSize.UINT8:
-                        entry = struct.unpack("<B", entry)
-                    elif new_macro["wordSize"] == FurnaceMacroSize.INT8:
-                        entry = struct.unpack("<b", entry)
-                    elif new_macro["wordSize"] == FurnaceMacroSize.INT16:
-                        entry = struct.unpack("<h", entry)
-                    elif new_macro["wordSize"] == FurnaceMacroSize.INT32:
-                        entry = struct.unpack("<i", entry)
-                    macro_data.append(entry[0])
-                if new_macro["type"] == FurnaceMacroType.SEQUENCE:
-                    if loop != 255:
-                        macro_data.insert(loop, FurnaceMacroItem.LOOP)
-                    if release != 255:
-                        macro_data.insert(release, FurnaceMacroItem.RELEASE)
-                new_macro["data"] = macro_data
-                macro_list.append(new_macro)
-            return macro_list
-        elif self.code == "64":
-            return # TODO
-        elif self.code == "GB":
-            env = read_as_single("B", data)
-            vl = env & 0b1111
-            dr = (env & 0b10000) >> 4
-            ln = (env & 0b11100000) >> 5
-            sl = read_as_single("B", data)
-            fl = read_as_single("B", data)
-            swe = bool(fl & 0b1)
-            ie = bool(fl & 0b10)
-            hwsl = read_as_single("B", data)
-            hws = []
-            for i in range(hwsl):
-                hws.append(data.read(3))
-            return {
-                "envelope": {
-                    "volume": vl,
-                    "direction": dr,
-                    "length": ln
-                },
-                "soundLength": sl,
-                "flags": {
-                    "softwareEnvelope": swe,
-                    "initEnvelope": ie
-                },
-                "sequence": hws,
-            }
-        elif self.code == "SM":
-            return # TODO
-        elif self.code == "O1":
-            return # TODO
-        elif self.code == "O2":
-            return # TODO
-        elif self.code == "O3":
-            return # TODO
-        elif self.code == "O4":
-            return # TODO
-        elif self.code == "LD":
-            return # TODO
-        elif self.code == "SN":
-            return # TODO
-        elif self.code == "N1":
-            return {
-                "waveInit": read_as_single("i", data),
-                "wavePos": read_as_single("b", data),
-                "waveLen": read_as_single("b", data),
-                "waveMode": read_as_single("b", data),
-            }
-        elif self.code == "FD":
-            return # TODO
-        elif self.code == "WS":
-            return # TODO
-        elif self.code == "SL":
-            return # TODO
-        elif self.code == "WL":
-            return # TODO
-        elif self.code == "MP":
-            return # TODO
-        elif self.code == "SU":
-            return # TODO
-        elif self.code == "ES":
-            return # TODO
-        elif self.code == "X1":
-            return # TODO
-    
+        """
+        Decodes the block into a string, a dict or a list of macros (see
+        `FEATURE_CODECS`), or None for blocks that can't be decoded yet.
+
+        The result is shared between calls, and any changes made to it
+        are encoded back into the block when it's serialized.
+        """
+        # cached as (code, result)
+        if (self.__interpreted is None) or (self.__interpreted[0] != self.code):
+            self.__interpreted = (self.code, decode_feature(self.code, self.data))
+        return self.__interpreted[1]
+
     def __repr__(self):
         if self.code == "EN":
             return "<Terminator block>"
@@ -0,0 +1,71 @@
+from collections.abc import MutableSequence
+
+class LazySectionList(MutableSequence):
+    """
+    A list of module sections (instruments, wavetables, samples or patterns)
+    that are only decoded when they are first accessed.
+
+    Each item starts out as a location in the module stream. The first time
+    an item is requested, `loader(location)` is called to decode it, and the
+    result is cached so that subsequent accesses are free.
+
+    Items that are assigned or inserted by the user are stored as-is and have
+    no location.
+    """
+    __UNLOADED = object()
+
+    def __init__(self, locations, loader):
+        self.__locations = list(locations)
+        self.__items = [self.__UNLOADED] * len(self.__locations)
+        self.__loader = loader
+
+    def __len__(self):
+        return len(self.__items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        item = self.__items[index]
+        if item is self.__UNLOADED:
+            item = self.__loader(self.__locations[index])
+            self.__items[index] = item
+        return item
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            indices = range(*index.indices(len(self)))
+            if len(indices) != len(value):
+                # resizing slices aren't worth the trouble here
+                raise ValueError("Slice assignment must not change the list size")
+            for i, v in zip(indices, value):
+                self[i] = v
+            return
+        self.__items[index] = value
+        self.__locations[index] = None
+
+    def __delitem__(self, index):
+        del self.__items[index]
+        del self.__locations[index]
+
+    def insert(self, index, value):
+        self.__items.insert(index, value)
+        self.__locations.insert(index, None)
+
+    def is_loaded(self, index):
+        """
+        Whether the item at `index` has been decoded (or set by the user).
+        """
+        return self.__items[index] is not self.__UNLOADED
+
+    def location(self, index):
+        """
+        Stream offset the item at `index` was read from, or None if the
+        item did not come from the stream.
+        """
+        return self.__locations[index]
+
+    def __repr__(self):
+        return "<Lazy section list, %d of %d loaded>" % (
+            sum(1 for i in range(len(self)) if self.is_loaded(i)),
+            len(self)
+        )
@@ -5,16 +5,47 @@ This is a library for viewing and manipulating FurnaceTracker .fur files.
 
 import zlib
 import io
-from .util import read_as, read_as_single, write_as, truthy_to_boolbyte
-from .types import FurnaceChip, FurnaceNote, FurnaceInstrumentType, FurnaceMacroItem
+import os
+import tempfile
+import shutil
+import mmap
+import bisect
+from collections import namedtuple
+from .util import read_as, read_as_single, write_as, truthy_to_boolbyte, codec
+from .types import FurnaceChip, FurnaceNote, FurnaceInstrumentType, FurnaceMacroItem, CHIP_TABLE, decode_enum
 from .instrument import FurnaceInstrument
 from .instrument_dx import FurnaceInstrumentDX
 from .wavetable import FurnaceWavetable
 from .sample import FurnaceSample
-from .pattern import FurnacePattern
+from .pattern import FurnacePattern, pattern_hash
+from .lazy import LazySectionList
+from .stream import MemoryStream, InflateStream
 
 FUR_STRING = b"-Furnace module-"
 
+FurnaceModuleSummary = namedtuple(
+    "FurnaceModuleSummary",
+    ["name", "author", "version", "chips", "channels", "order_length"]
+)
+FurnaceModuleSummary.__doc__ = """
+Basic information about a module, as returned by `FurnaceModule.probe`.
+"""
+
+def _open_stream(file_name):
+    """
+    Opens a .fur file as a stream of uncompressed module data.
+    """
+    fur_in = open(file_name, "rb")
+    # uncompressed file
+    if fur_in.read(16) == FUR_STRING:
+        with fur_in:
+            return MemoryStream(
+                mmap.mmap(fur_in.fileno(), 0, access=mmap.ACCESS_READ)
+            )
+    # compressed file, the stream takes ownership of it
+    fur_in.seek(0)
+    return InflateStream(fur_in)
+
 class FurnaceModule:
     """
     A representation of a FurnaceTracker module is contained
@@ -35,6 +66,13 @@ class FurnaceModule:
     ------------------------------------
     Currently a binary blob `list` detailing which compatibility flags are set.
 
+    `unparsedInfo`
+    --------------
+    The rest of the song info after `extendedCompatFlags`, which this
+    library doesn't read yet (newer compat flags, subsong data, extra
+    metadata...). It's written back as-is when saving; None for new
+    modules.
+
     `info`
     ------
     General module information. Contained within:
@@ -67,6 +105,13 @@ class FurnaceModule:
     ----------
     A list of `FurnacePattern` used in the module.
 
+    `pattern_index`
+    ---------------
+    A `dict` mapping the hash of each pattern's row data (see
+    `pattern_hash`) to a list of the (channel, index) of every pattern
+    that has those exact rows. It's made from the raw pattern blocks
+    without decoding them, and doesn't follow later changes to `patterns`.
+
     `timing`
     --------
     TODO
@@ -74,15 +119,30 @@ class FurnaceModule:
     `wavetables`
     ------------
     TODO
+
+    Lazy loading
+    ------------
+    If `lazy` is set, `instruments`, `wavetables`, `samples` and `patterns`
+    are `LazySectionList`s instead of lists. Each item is only decoded the
+    first time it is accessed, so the stream the module was loaded from is
+    kept around until `close` is called (or the module is used as a context
+    manager).
+
+    Incremental saving
+    ------------------
+    Saving a lazily-loaded module with `incremental=True` copies the
+    sections that were never loaded (so can't have been changed) straight
+    from the stream the module was loaded from, and only encodes the rest.
     """
 
-    def __init__(self, new_module=False, file_name=None, stream=None):
+    def __init__(self, new_module=False, file_name=None, stream=None, lazy=False):
         """
         Initializes either an "empty" FurnaceTracker module, or, if
         supplied either a file name or a stream, deserializes a FurnaceTracker
         module from that.
         """
         self.file_name = None
+        self.lazy = lazy
 
         # initialize as if we just started a new module
 
@@ -93,6 +153,7 @@ class FurnaceModule:
         self.info = {}
         self.compatFlags = []
         self.extendedCompatFlags = None
+        self.unparsedInfo = None
         self.patterns = []
         self.instruments = []
         self.wavetables = []
@@ -101,10 +162,15 @@ class FurnaceModule:
         # these are only used in the loading routines
         self.__version = None
         self.__song_info_ptr = None
+        self.__info_end = None
         self.__loc_instruments = None
         self.__loc_waves = None
         self.__loc_samples = None
         self.__loc_patterns = None
+        self.__block_starts = None
+        self.__pattern_index = None
+        self.__foreign_blocks = None
+        self.__stream = None
 
         if type(file_name) is str:
             self.load_from_file(file_name)
@@ -115,18 +181,41 @@ class FurnaceModule:
         """
         Deserializes a .fur file. Automatically detects compressed or
         uncompressed files.
+
+        Uncompressed files are memory-mapped rather than read in, and
+        compressed files are decompressed as the parser goes through them.
         """
         self.file_name = file_name
-        with open(file_name, "rb") as fur_in:
-            # uncompressed file
-            if fur_in.read(16) == FUR_STRING:
-                fur_in.seek(0)
-                return self.load_from_bytes( fur_in.read() )
-            # compressed file
-            fur_in.seek(0)
-            return self.load_from_bytes(
-                zlib.decompress( fur_in.read() )
-            )
+        stream = _open_stream(file_name)
+        try:
+            self.load_from_stream(stream)
+        except:
+            stream.close()
+            raise
+        if not self.lazy:
+            stream.close()
+
+    def probe(file_name):
+        """
+        Reads only the header and song info of a .fur file, and returns a
+        `FurnaceModuleSummary` of it. Compressed files are only inflated
+        as far as the song info goes.
+
+        This method does not need instantiation to be run.
+        """
+        module = FurnaceModule()
+        with _open_stream(file_name) as stream:
+            module.__read_header(stream)
+            module.__read_info(stream)
+        chips = tuple(module.chips["list"])
+        return FurnaceModuleSummary(
+            name=module.meta["name"],
+            author=module.meta["author"],
+            version=module.meta["version"],
+            chips=chips,
+            channels=sum(chip.channels for chip in chips),
+            order_length=len(module.order[0]) if module.order else 0
+        )
 
     def decompress_to_file(in_name, out_name):
         """
@@ -143,11 +232,13 @@ class FurnaceModule:
 
     def load_from_bytes(self, bytes):
         """
-        Loads a FurnaceTracker module from raw bytes.
-        (Must be in uncompressed form)
+        Loads a FurnaceTracker module from raw bytes, or anything else
+        that supports the buffer protocol. (Must be in uncompressed form)
+
+        The bytes are not copied.
         """
         return self.load_from_stream(
-            io.BytesIO(bytes)
+            MemoryStream(bytes)
         )
 
     def load_from_stream(self, stream):
@@ -157,10 +248,48 @@ class FurnaceModule:
         """
         self.__read_header(stream)
         self.__read_info(stream)
-        self.__read_instruments(stream)
-        self.__read_wavetables(stream)
-        self.__read_samples(stream)
-        self.__read_patterns(stream)
+        self.__stream = stream
+        if self.lazy:
+            # for finding where blocks end when copying them, see __copy_block
+            self.__block_starts = sorted(set(
+                self.__loc_instruments + self.__loc_waves +
+                self.__loc_samples + self.__loc_patterns
+            ))
+            self.instruments = LazySectionList(self.__loc_instruments, self.__read_instrument)
+            self.wavetables = LazySectionList(self.__loc_waves, self.__read_wavetable)
+            self.samples = LazySectionList(self.__loc_samples, self.__read_sample)
+            self.patterns = LazySectionList(self.__loc_patterns, self.__read_pattern)
+        else:
+            self.__index_patterns()
+            self.__find_foreign_blocks()
+            self.instruments += [self.__read_instrument(i) for i in self.__loc_instruments]
+            self.wavetables += [self.__read_wavetable(i) for i in self.__loc_waves]
+            self.samples += [self.__read_sample(i) for i in self.__loc_samples]
+            self.patterns += [self.__read_pattern(i) for i in self.__loc_patterns]
+            # nothing left to decode, don't hold on to the stream
+            self.__stream = None
+
+    @property
+    def pattern_index(self):
+        # lazy modules only hash their patterns once asked to
+        if (self.__pattern_index is None) and (self.__stream is not None):
+            self.__index_patterns()
+        return self.__pattern_index or {}
+
+    def close(self):
+        """
+        Releases the stream kept by a lazily-loaded module. Sections that
+        haven't been accessed yet can no longer be loaded after this.
+        """
+        if self.__stream is not None:
+            self.__stream.close()
+            self.__stream = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
     def make_new(self):
         """
@@ -228,36 +357,193 @@ class FurnaceModule:
         self.wavetables = []
         self.samples = []
 
-    def save_to_stream(self, stream):
+    def save_to_stream(self, stream, incremental=False):
         """
         Save an uncompressed Furnace module file.
-        This is untested.
+
+        The whole file is laid out in memory first, then written with a
+        single call.
+
+        If `incremental` is set, sections that haven't changed are copied
+        from the stream the module was loaded from rather than encoded
+        again. This only applies to lazily-loaded modules that haven't
+        been closed yet.
         """
-        version = self.meta["version"]
-        
-        stream.write(FUR_STRING)
+        return stream.write( self.save_to_bytes(incremental) )
+
+    def save_compressed_to_stream(self, stream, level=zlib.Z_DEFAULT_COMPRESSION, incremental=False):
+        """
+        Save a zlib-compressed Furnace module file, like the ones Furnace
+        itself saves. `level` is the zlib compression level (0-9).
+
+        Blocks are encoded (or copied) and compressed one at a time, so
+        there's never an uncompressed copy of the whole file in memory.
+        The catch is that every encoded block is encoded twice: once to
+        find out how long it is, and again when it's written out.
+        """
+        compressor = zlib.compressobj(level)
+        written = 0
+        for chunk in self.__serialize(incremental, keep=False):
+            written += stream.write( compressor.compress(chunk) )
+        written += stream.write( compressor.flush() )
+        return written
+
+    def save_to_file(self, file_name, compressed=False, level=zlib.Z_DEFAULT_COMPRESSION, incremental=False):
+        """
+        Saves a .fur file, zlib-compressed if `compressed` is set.
+        """
+        # write to a temporary file and swap it in at the end, since the
+        # file being saved over might still be memory-mapped by a module
+        # (or its samples)
+        handle, temp_name = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(file_name)), suffix=".tmp"
+        )
+        try:
+            with os.fdopen(handle, "wb") as fur_out:
+                if compressed:
+                    written = self.save_compressed_to_stream(fur_out, level, incremental)
+                else:
+                    written = self.save_to_stream(fur_out, incremental)
+        except:
+            os.remove(temp_name)
+            raise
+        # temporary files are private, give it the usual permissions
+        if os.path.exists(file_name):
+            shutil.copymode(file_name, temp_name)
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temp_name, 0o666 & ~umask)
+        os.replace(temp_name, file_name)
+        return written
+
+    def save_to_bytes(self, incremental=False):
+        """
+        Serializes the module into the bytes of an uncompressed Furnace
+        module file.
+        """
+        return b"".join( self.__serialize(incremental) )
+
+    def __serialize(self, incremental=False, keep=True):
+        # Yields the file in chunks: the header, the INFO block, then every
+        # instrument, wavetable, sample and pattern block.
+        #
+        # INFO points at every block, so the first pass only works out how
+        # long each one is. Unless `keep` is set, encoded blocks are dropped
+        # after being measured and encoded again in the second pass, so
+        # only one is around at a time.
+        self.__check_saveable()
+        blocks = []
+        for items in (self.instruments, self.wavetables, self.samples, self.patterns):
+            blocks += self.__plan_section(items, incremental, keep)
+
+        info, pointer_table = self.__serialize_info()
+
+        # now that everything's size is known, fill in the pointers
+        location = 0x20 + len(info)
+        pointers = []
+        for length, source in blocks:
+            pointers.append(location)
+            location += length
+        codec("I" * len(pointers)).pack_into(info, pointer_table, *pointers)
+
+        header = io.BytesIO()
+        header.write(FUR_STRING)
         # assume that song info always come after the basic header
-        write_as("hhi", (version, 0, 0x20), stream)
-        stream.write(b"\x00" * 8)
-        
+        write_as("HHI", (self.meta["version"], 0, 0x20), header)
+        header.write(b"\x00" * 8)
+
+        yield header.getvalue()
+        yield bytes(info)
+        for length, source in blocks:
+            if isinstance(source, slice):
+                yield self.__copy_block(source)
+            elif isinstance(source, bytes):
+                yield source
+            else:
+                yield self.__serialize_block(source)
+
+    def __check_saveable(self):
+        if (self.__foreign_blocks is None) and (self.__stream is not None):
+            self.__find_foreign_blocks()
+        if (self.meta["version"] >= 95) and (self.__foreign_blocks is None) \
+        and (self.unparsedInfo is not None):
+            raise Exception("Can't tell if saving would lose anything, the module stream is closed")
+        if self.__foreign_blocks:
+            raise Exception("Can't save this module, its %s blocks would be lost" % (
+                ", ".join(sorted(self.__foreign_blocks))
+            ))
+
+    def __plan_section(self, items, incremental, keep):
+        # Returns (length, source) for each block of a section. The source
+        # is the slice of the module stream to copy, the encoded block if
+        # `keep` is set, or else the item to encode again.
+        #
+        # Blocks that were never loaded are copied from the module stream,
+        # if it's still around and knows where they came from.
+        copy = incremental and (self.__stream is not None) \
+            and isinstance(items, LazySectionList)
+        blocks = []
+        for i in range(len(items)):
+            location = items.location(i) if copy else None
+            if (location is not None) and not items.is_loaded(i):
+                extent = self.__block_extent(location)
+                blocks.append((extent.stop - extent.start, extent))
+            else:
+                block = self.__serialize_block(items[i])
+                blocks.append((len(block), block if keep else items[i]))
+        return blocks
+
+    def __block_extent(self, location):
+        # The slice of the module stream taken up by the block at `location`.
+        stream = self.__seek_to(location)
+        stream.read(4) # block ID
+        size = read_as_single("I", stream)
+        if size != 0:
+            return slice(location, location + 8 + size)
+        # older Furnace versions leave the size at 0, so the block goes on
+        # until the next one (or the end of the file)
+        following = bisect.bisect_right(self.__block_starts, location)
+        if following < len(self.__block_starts):
+            return slice(location, self.__block_starts[following])
+        return slice(location, stream.seek(0, io.SEEK_END))
+
+    def __copy_block(self, extent):
+        stream = self.__seek_to(extent.start)
+        if hasattr(stream, "read_view"):
+            return stream.read_view(extent.stop - extent.start)
+        return stream.read(extent.stop - extent.start)
+
+    def __serialize_block(self, item):
+        block = io.BytesIO()
+        item.save_to_stream(block)
+        block = block.getbuffer()
+        # fill in the block size, which doesn't count the ID and size itself
+        codec("I").pack_into(block, 4, len(block) - 8)
+        return block.tobytes()
+
+    def __serialize_info(self):
+        # Returns the INFO block as a bytearray, along with where in it the
+        # (zeroed out) pointer table is.
+        version = self.meta["version"]
+        stream = io.BytesIO()
+
         stream.write(b"INFO")
-        stream.write(b"\x00" * 4)
-        write_as("bbbbf", (
+        stream.write(b"\x00" * 4) # size, filled in later
+        write_as("BBBBf", (
             self.timing["timebase"],
             *self.timing["speed"],
             self.timing["arpSpeed"],
             self.timing["clockSpeed"]
         ), stream)
-        
-        length = 0
-        for i in self.patterns:
-            new_length = len(i.data)
-            if new_length > length:
-                length = new_length
-        
-        order_length = len(self.order[0])
-        
-        write_as("hhbbhhhi", (
+
+        length = self.info.get("patternLength")
+        if length is None:
+            length = max([len(i.data) for i in self.patterns], default=0)
+
+        order_length = len(self.order[0]) if self.order else 0
+
+        write_as("HHBBHHHI", (
                 length,
                 order_length,
                 *self.timing["highlight"],
@@ -267,96 +553,72 @@ class FurnaceModule:
                 len(self.patterns)
             ), stream
         )
-        
-        chips = [b"\x00"] * 32
-        chips_pos = 0
-        for i in self.chips["list"]:
-            chips[chips_pos] = int.to_bytes(i.value, 1, "little")
-            chips_pos += 1
-        stream.write(b"".join(chips))
-        
-        for i in self.chips["volume"]:
-            write_as("B", [int(i * 64)], stream)
-        
-        for i in self.chips["panning"]:
-            write_as("B", [int(i * 64)], stream)
-        
+
+        chips = bytearray(32)
+        for i in range(len(self.chips["list"])):
+            chips[i] = self.chips["list"][i].value
+        stream.write(chips)
+
+        # loaded modules have `volumes`, new ones have `volume`
+        volumes = self.chips.get("volumes", self.chips.get("volume"))
+        write_as("b" * 32, [int(i * 64) for i in volumes], stream)
+
+        write_as("b" * 32, self.chips["panning"], stream)
+
         for i in self.chips["settings"]:
             stream.write(i)
-        
+
         write_as("string", self.meta["name"], stream)
         write_as("string", self.meta["author"], stream)
         write_as("f", (self.info["tuning"],), stream)
-        
+
         # compatFlags are a blob for now
         for i in self.compatFlags:
             stream.write(i)
-        
+
         # to get back to later
-        pointer_locs = {}
-        data_locs = {
-            "instruments":[],
-            "wavetables":[],
-            "samples":[],
-            "patterns":[]
-        }
-        pointer_locs["instruments"] = stream.tell()
-        for i in range( len(self.instruments) ):
-            write_as("i", (0,), stream)
-        pointer_locs["wavetables"] = stream.tell()
-        for i in range( len(self.wavetables) ):
-            write_as("i", (0,), stream)
-        pointer_locs["samples"] = stream.tell()
-        for i in range( len(self.samples) ):
-            write_as("i", (0,), stream)
-        pointer_locs["patterns"] = stream.tell()
-        for i in range( len(self.patterns) ):
-            write_as("i", (0,), stream)
-        
+        pointer_table = stream.tell()
+        stream.write(b"\x00" * 4 * (
+            len(self.instruments) + len(self.wavetables) +
+            len(self.samples) + len(self.patterns)
+        ))
+
         # write ordering
-        for i in range(order_length):
-            for j in self.order:
-                write_as("b", (self.order[j][i],), stream)
-        
-        for i in self.info["effectColumns"]:
-            write_as("b", (i,), stream)
-        
+        for channel in self.order:
+            write_as("B" * order_length, self.order[channel], stream)
+
+        write_as("B" * len(self.info["effectColumns"]), self.info["effectColumns"], stream)
+
         for i in self.info["channelsShown"]:
             stream.write( truthy_to_boolbyte(i) )
-        
+
         for i in self.info["channelsCollapsed"]:
             stream.write( truthy_to_boolbyte(i) )
-        
+
         for i in self.info["channelNames"]:
             write_as("string", i, stream)
-        
+
         for i in self.info["channelAbbreviations"]:
             write_as("string", i, stream)
-        
+
         write_as("string", self.meta["comment"], stream)
-        
+
         if version >= 59:
             write_as("f", (self.info["masterVolume"],), stream)
-        
-        if version >= 70:
-            # extend compat are also a blob for now
-            if self.extendedCompatFlags:
-                stream.write(self.extendedCompatFlags)
-        
-        # save patterns
-        for i in self.patterns:
-            data_locs["patterns"].append( stream.tell() )
-            i.save_to_stream(stream)
-        
-        # TODO: instruments
-        # TODO: wavetables
-        # TODO: samples
-        
-        # go back to pointers
-        stream.seek( pointer_locs["patterns"] )
-        for i in data_locs["patterns"]:
-            write_as("i", (i,), stream)
-        
+
+        if self.unparsedInfo is not None:
+            # loaded modules get back everything that came after
+            stream.write( self.extendedCompatFlags or b"" )
+            stream.write( self.unparsedInfo )
+        elif version >= 70:
+            # extend compat are also a blob for now, padded with reserved
+            # bytes to 32 bytes total
+            stream.write( (self.extendedCompatFlags or b"").ljust(32, b"\x00") )
+
+        info = bytearray(stream.getbuffer())
+        codec("I").pack_into(info, 4, len(info) - 8)
+        return info, pointer_table
+
     def __read_header(self, stream):
         if stream.read(16) != FUR_STRING:
             raise Exception("Invalid Furnace module (magic number invalid)")
@@ -372,7 +634,7 @@ class FurnaceModule:
         stream.seek(self.__song_info_ptr)
         if stream.read(4) != b"INFO":
             raise Exception("Broken INFO header")
-        stream.read(4) # XXX reserved
+        info_size = read_as_single("I", stream)
 
         # timing info
         self.timing["timebase"] = read_as_single("B", stream) # 0-indexed
@@ -405,7 +667,7 @@ class FurnaceModule:
             if chip_id == 0:
                 break;
             try:
-                self.chips["list"].append( FurnaceChip(chip_id) )
+                self.chips["list"].append( decode_enum(CHIP_TABLE, FurnaceChip, chip_id) )
             except ValueError:
                 pass
 
@@ -497,48 +759,91 @@ class FurnaceModule:
         
         self.extendedCompatFlags = extendedCompat
 
-    def __read_instruments(self, stream):
-        for i in self.__loc_instruments:
-            stream.seek(i)
-            inst_type = stream.read(4)
-            stream.seek(-4, 1)
-            if inst_type == b"INST":
-                self.instruments.append(
-                    FurnaceInstrument(stream=stream)
-                )
-            elif inst_type == b"INS2": # dev127+
-                self.instruments.append(
-                    FurnaceInstrumentDX(stream=stream)
-                )
-            else:
-                raise Exception("Unknown instrument type?")
-
-    def __read_wavetables(self, stream):
-        for i in self.__loc_waves:
-            stream.seek(i)
-            self.wavetables.append(
-                FurnaceWavetable(stream=stream)
-            )
-
-    def __read_samples(self, stream):
-        for i in self.__loc_samples:
-            stream.seek(i)
-            self.samples.append(
-                FurnaceSample(stream=stream)
-            )
-
-    def __read_patterns(self, stream):
-        for i in self.__loc_patterns:
-            stream.seek(i)
-            self.patterns.append(
-                FurnacePattern(
-                    stream=stream,
-                    stream_info={
-                        "effectColumns": self.info["effectColumns"],
-                        "patternLength": self.info["patternLength"]
-                    }
-                )
+        # keep whatever comes after this, so it survives saving
+        if info_size != 0:
+            info_end = self.__song_info_ptr + 8 + info_size
+        else:
+            # older versions leave the size at 0, so INFO goes on until
+            # the first block
+            info_end = min(
+                self.__loc_instruments + self.__loc_waves +
+                self.__loc_samples + self.__loc_patterns,
+                default=None
             )
+        self.__info_end = info_end
+        if info_end is None:
+            self.unparsedInfo = None
+        else:
+            self.unparsedInfo = stream.read(info_end - stream.tell())
+
+    def __find_foreign_blocks(self):
+        # Newer versions have blocks other than the ones this library
+        # writes (e.g. subsongs), which the unparsed song info points to.
+        # Saving without them would leave those pointers dangling, so
+        # they're looked for here. Blocks come one after another after
+        # INFO, so they're found by going by their sizes.
+        self.__foreign_blocks = set()
+        if (self.__version < 95) or (self.__info_end is None):
+            return
+        known = (b"INST", b"INS2", b"WAVE", b"SMPL", b"SMP2", b"PATR")
+        stream = self.__stream
+        end = stream.seek(0, io.SEEK_END)
+        location = self.__info_end
+        while location + 8 <= end:
+            stream.seek(location)
+            block_id = stream.read(4)
+            size = read_as_single("I", stream)
+            if block_id not in known:
+                self.__foreign_blocks.add(block_id.decode("ascii", "replace"))
+            if size == 0:
+                break
+            location += 8 + size
+
+    def __seek_to(self, location):
+        if self.__stream is None:
+            raise Exception("Module stream is closed, can't load sections anymore")
+        self.__stream.seek(location)
+        return self.__stream
+
+    def __index_patterns(self):
+        index = {}
+        stream = self.__stream
+        read = stream.read_view if hasattr(stream, "read_view") else stream.read
+        for location in self.__loc_patterns:
+            # skip the block ID and size
+            stream.seek(location + 8)
+            channel, pattern = read_as("HH", stream)
+            stream.seek(4, io.SEEK_CUR) # reserved
+            row_size = 4*2 + self.info["effectColumns"][channel]*4
+            digest = pattern_hash(read(row_size * self.info["patternLength"]))
+            index.setdefault(digest, []).append((channel, pattern))
+        self.__pattern_index = index
+
+    def __read_instrument(self, location):
+        stream = self.__seek_to(location)
+        inst_type = stream.read(4)
+        stream.seek(-4, 1)
+        if inst_type == b"INST":
+            return FurnaceInstrument(stream=stream)
+        elif inst_type == b"INS2": # dev127+
+            return FurnaceInstrumentDX(stream=stream)
+        else:
+            raise Exception("Unknown instrument type?")
+
+    def __read_wavetable(self, location):
+        return FurnaceWavetable(stream=self.__seek_to(location))
+
+    def __read_sample(self, location):
+        return FurnaceSample(stream=self.__seek_to(location), version=self.__version)
+
+    def __read_pattern(self, location):
+        return FurnacePattern(
+            stream=self.__seek_to(location),
+            stream_info={
+                "effectColumns": self.info["effectColumns"],
+                "patternLength": self.info["patternLength"]
+            }
+        )
 
     def __repr__(self):
         return "<Furnace module '%s' by %s>" % (
@@ -1,7 +1,227 @@
 import zlib
 import io
-from .util import read_as, read_as_single, write_as
-from .types import FurnaceChip, FurnaceNote, FurnaceInstrumentType, FurnaceMacroItem
+import sys
+import hashlib
+from array import array
+from collections.abc import Mapping, Sequence
+from .util import read_as, read_as_single, write_as, codec
+from .types import FurnaceChip, FurnaceNote, FurnaceInstrumentType, FurnaceMacroItem, NOTE_TABLE, decode_enum
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def decode_pattern_rows(data, effects, use_numpy=False):
+    """
+    Decodes a whole PATR pattern body (as bytes or any other buffer) in one go.
+    Every row is `4*2 + effects*4` bytes long.
+
+    Returns a list of row dicts, same as `FurnacePattern.data`.
+
+    If `use_numpy` is set and NumPy is available, the body is decoded as a
+    structured array instead of with `struct.iter_unpack`.
+    """
+    if use_numpy and (numpy is not None):
+        return _decode_rows_numpy(data, effects)
+
+    rows = []
+    for row in codec("HHhh" + "hh" * effects).iter_unpack(data):
+        note = decode_enum(NOTE_TABLE, FurnaceNote, row[0])
+        octave = row[1]
+        # work around quirk, thanks Delek!
+        if note == FurnaceNote.C_:
+            octave += 1
+        rows.append({
+            "note": note,
+            "octave": octave,
+            "instrument": row[2],
+            "volume": row[3],
+            "effects": list(zip(row[4::2], row[5::2]))
+        })
+    return rows
+
+def _decode_rows_numpy(data, effects):
+    row_type = numpy.dtype([
+        ("note", "<u2"),
+        ("octave", "<u2"),
+        ("instrument", "<i2"),
+        ("volume", "<i2"),
+        ("effects", "<i2", (effects, 2))
+    ])
+    table = numpy.frombuffer(data, dtype=row_type)
+
+    # work around quirk, thanks Delek!
+    octaves = table["octave"].astype("<i4")
+    octaves[table["note"] == FurnaceNote.C_.value] += 1
+
+    rows = []
+    for note, octave, instrument, volume, fx in zip(
+        table["note"].tolist(),
+        octaves.tolist(),
+        table["instrument"].tolist(),
+        table["volume"].tolist(),
+        table["effects"].tolist()
+    ):
+        rows.append({
+            "note": decode_enum(NOTE_TABLE, FurnaceNote, note),
+            "octave": octave,
+            "instrument": instrument,
+            "volume": volume,
+            "effects": [tuple(x) for x in fx]
+        })
+    return rows
+
+def pattern_hash(data):
+    """
+    A stable hash of a pattern's raw row data, as stored in its PATR block.
+    Patterns with the same hash have the same rows.
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+class FurnacePatternRow(Mapping):
+    """
+    A view of a single row of `FurnacePatternColumns`. Reads (and writes)
+    like one of the row dicts of `FurnacePattern.data`, with the keys
+    `note`, `octave`, `instrument`, `volume` and `effects`.
+    """
+    __slots__ = ("columns", "row")
+    __keys = ("note", "octave", "instrument", "volume", "effects")
+
+    def __init__(self, columns, row):
+        self.columns = columns
+        self.row = row
+
+    def __getitem__(self, key):
+        columns = self.columns
+        row = self.row
+        if key == "note":
+            return decode_enum(NOTE_TABLE, FurnaceNote, columns.note[row])
+        elif key == "octave":
+            return columns.octave[row]
+        elif key == "instrument":
+            return columns.instrument[row]
+        elif key == "volume":
+            return columns.volume[row]
+        elif key == "effects":
+            return [(fx[row], fx_val[row]) for fx, fx_val in columns.effects]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        columns = self.columns
+        row = self.row
+        if key == "note":
+            columns.note[row] = FurnaceNote(value).value
+        elif key in ("octave", "instrument", "volume"):
+            getattr(columns, key)[row] = value
+        elif key == "effects":
+            if len(value) != len(columns.effects):
+                raise ValueError("Row needs exactly %d effects" % len(columns.effects))
+            for (fx, fx_val), (new_fx, new_val) in zip(columns.effects, value):
+                fx[row] = new_fx
+                fx_val[row] = new_val
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.__keys)
+
+    def __len__(self):
+        return len(self.__keys)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+class FurnacePatternColumns(Sequence):
+    """
+    Compact, column-oriented storage for pattern rows.
+
+    Each field is kept in its own `array('h')`:
+        * `note` - Raw `FurnaceNote` values.
+        * `octave` - With the C_ quirk already applied.
+        * `instrument`
+        * `volume`
+        * `effects` - A `list` of `(effect, value)` array pairs, one for
+          each effect column.
+
+    Indexing it gives `FurnacePatternRow` views, so it can be used in
+    place of the usual list of row dicts. Since the columns are plain
+    arrays, they can also be handed to e.g. `numpy.frombuffer` as-is.
+    """
+    def __init__(self, effect_columns=0):
+        self.note = array("h")
+        self.octave = array("h")
+        self.instrument = array("h")
+        self.volume = array("h")
+        self.effects = [(array("h"), array("h")) for i in range(effect_columns)]
+
+    def from_bytes(data, effects):
+        """
+        Makes columns out of a whole PATR pattern body.
+        """
+        columns = FurnacePatternColumns(effects)
+        stride = 4 + effects*2
+        values = array("h", bytes(data))
+        if sys.byteorder != "little":
+            values.byteswap()
+
+        columns.note = values[0::stride]
+        columns.octave = values[1::stride]
+        columns.instrument = values[2::stride]
+        columns.volume = values[3::stride]
+        columns.effects = [
+            (values[4 + i*2::stride], values[5 + i*2::stride])
+            for i in range(effects)
+        ]
+
+        # work around quirk, thanks Delek!
+        for row, note in enumerate(columns.note):
+            if note == FurnaceNote.C_.value:
+                columns.octave[row] += 1
+        return columns
+
+    def from_rows(rows, effects):
+        """
+        Makes columns out of a list of row dicts.
+        """
+        columns = FurnacePatternColumns(effects)
+        for row in rows:
+            columns.append(row)
+        return columns
+
+    def append(self, row):
+        self.note.append(FurnaceNote(row["note"]).value)
+        self.octave.append(row["octave"])
+        self.instrument.append(row["instrument"])
+        self.volume.append(row["volume"])
+        if len(row["effects"]) != len(self.effects):
+            raise ValueError("Row needs exactly %d effects" % len(self.effects))
+        for (fx, fx_val), (new_fx, new_val) in zip(self.effects, row["effects"]):
+            fx.append(new_fx)
+            fx_val.append(new_val)
+
+    def used_instruments(self):
+        """
+        The set of instrument IDs used in these rows.
+        """
+        return set(self.instrument) - {-1}
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [FurnacePatternRow(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not (0 <= index < len(self)):
+            raise IndexError("Pattern row out of range")
+        return FurnacePatternRow(self, index)
+
+    def __len__(self):
+        return len(self.note)
+
+    def __repr__(self):
+        return "<Furnace pattern columns, %d rows, %d effects>" % (
+            len(self), len(self.effects)
+        )
 
 class FurnacePattern:
     """
@@ -9,7 +229,16 @@ class FurnacePattern:
         "effectColumns": <int>,
         "patternLength": <int>
     }
+
+    Set `FurnacePattern.use_numpy` to decode pattern bodies with NumPy
+    (if it's installed) rather than `struct`.
+
+    Set `FurnacePattern.columnar` to store `data` as `FurnacePatternColumns`
+    rather than a list of dicts, which takes up a lot less memory.
     """
+    use_numpy = False
+    columnar = False
+
     # does it even have a separate file format??
     def __init__(self, init_data=None, file_name=None, stream=None, stream_info=None):
         self.channel = 0
@@ -50,7 +279,7 @@ class FurnacePattern:
             write_as("h", (i["volume"],), stream)
             for fx in i["effects"]:
                 write_as("hh", fx, stream)
-            write_as("string", self.name, stream)
+        write_as("string", self.name, stream)
 
     def __read_pattern(self, stream, stream_info):
         if stream.read(4) != b"PATR":
@@ -65,27 +294,14 @@ class FurnacePattern:
         
         effects = stream_info["effectColumns"][self.channel]
         pattern_length = stream_info["patternLength"]
-        
-        for p in range(pattern_length):
-            new_row = {}
-            new_row["note"] = read_as_single("H", stream)
-            new_row["note"] = FurnaceNote(new_row["note"])
-
-            new_row["octave"] = read_as_single("H", stream)
-
-            # work around quirk, thanks Delek!
-            if new_row["note"] == FurnaceNote.C_:
-                new_row["octave"] += 1
-
-            new_row["instrument"] = read_as_single("h", stream)
-
-            new_row["volume"] = read_as_single("h", stream)
-
-            new_row["effects"] = []
-            for x in range(effects):
-                new_row["effects"].append(read_as("hh", stream))
 
-            self.data.append(new_row)
+        # every row has the same size, so read them all at once
+        row_size = 4*2 + effects*4
+        body = stream.read(row_size * pattern_length)
+        if self.columnar:
+            self.data = FurnacePatternColumns.from_bytes(body, effects)
+        else:
+            self.data = decode_pattern_rows(body, effects, self.use_numpy)
 
         self.name = read_as("string", stream)
 
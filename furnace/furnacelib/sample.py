@@ -1,18 +1,49 @@
 import zlib
 import io
+import sys
+from array import array
 from .util import read_as, read_as_single, write_as
-from .types import FurnaceChip, FurnaceNote, FurnaceInstrumentType, FurnaceMacroItem, FurnaceSampleType
+from .types import FurnaceChip, FurnaceNote, FurnaceInstrumentType, FurnaceMacroItem, FurnaceSampleType, SAMPLE_TYPE_TABLE, decode_enum
+
+def sample_data_size(depth, length):
+    """
+    How many bytes `length` samples of a given `FurnaceSampleType` take up.
+    """
+    if depth in (FurnaceSampleType.ZX_DRUM, FurnaceSampleType.NES_DPCM):
+        return (length + 7) // 8
+    if depth == FurnaceSampleType.PCM_8:
+        return length
+    if depth == FurnaceSampleType.PCM_16:
+        return length * 2
+    if depth == FurnaceSampleType.SNES_BRR:
+        return 9 * ((length + 15) // 16)
+    # 4-bit ADPCM of some sort
+    return (length + 1) // 2
 
 class FurnaceSample:
+    """
+    The sample data is kept as-is in `raw`, which is a slice of the buffer
+    the module was loaded from when possible, so loading a sample doesn't
+    copy it. `data` decodes it on demand: 8 and 16-bit PCM samples come
+    out as signed values, everything else as the raw bytes.
+
+    `version` is the version of the module the sample is from. Modules
+    before version 58 always store samples as 16-bit PCM, whatever their
+    depth says.
+    """
     # does it even have a separate file format??
-    def __init__(self, file_name=None, stream=None):
-        self.data = []
+    def __init__(self, file_name=None, stream=None, version=None):
+        self.raw = b""
+        self.version = version
+        # "SMPL", or "SMP2" for version 102+
+        self.block_id = b"SMPL"
         self.info = {
             "sampleRate": None,
             "depth": None,
             "name": None,
             "volume": None,
-            "pitch": None
+            "pitch": None,
+            "length": 0
         }
 
         if type(file_name) is str:
@@ -20,6 +51,42 @@ class FurnaceSample:
         elif stream is not None:
             self.load_from_stream(stream)
 
+    @property
+    def stored_depth(self):
+        """
+        The `FurnaceSampleType` that `raw` is actually in.
+        """
+        if (self.version is not None) and (self.version < 58):
+            return FurnaceSampleType.PCM_16
+        return self.info["depth"]
+
+    @property
+    def data(self):
+        depth = self.stored_depth
+        if depth == FurnaceSampleType.PCM_8:
+            return memoryview(self.raw).cast("B").cast("b")
+        if depth == FurnaceSampleType.PCM_16:
+            if sys.byteorder == "little":
+                return memoryview(self.raw).cast("B").cast("h")
+            samples = array("h", self.raw)
+            samples.byteswap()
+            return samples
+        return memoryview(self.raw).cast("B")
+
+    @data.setter
+    def data(self, samples):
+        depth = self.stored_depth
+        if depth == FurnaceSampleType.PCM_8:
+            self.raw = array("b", samples).tobytes()
+        elif depth == FurnaceSampleType.PCM_16:
+            samples = array("h", samples)
+            if sys.byteorder != "little":
+                samples.byteswap()
+            self.raw = samples.tobytes()
+        else:
+            raise Exception("Only PCM samples can be set this way, set `raw` instead")
+        self.info["length"] = len(samples)
+
     def load_from_file(self, file_name):
         pass
 
@@ -29,34 +96,84 @@ class FurnaceSample:
     def load_from_stream(self, stream):
         self.__read_header_and_sample(stream)
 
+    def save_to_stream(self, stream):
+        stream.write(self.block_id)
+        stream.write(b"\x00" * 4) # reserved
+        write_as("string", self.info["name"], stream)
+        if self.block_id == b"SMP2":
+            write_as("iiiBBBBii", (
+                self.info["length"],
+                self.info["sampleRate"],
+                self.info["baseRate"],
+                self.info["depth"].value,
+                self.info["loopDirection"],
+                self.info["flags"],
+                self.info["flags2"],
+                self.info["loopPoint"],
+                self.info["loopEnd"]
+            ), stream)
+            stream.write(self.info["renderOn"])
+            stream.write(b"\x00" * 4) # reserved
+        else:
+            write_as("iihhbbhi", (
+                self.info["length"],
+                self.info["sampleRate"],
+                self.info["volume"],
+                self.info["pitch"],
+                self.info["depth"].value,
+                0, # reserved
+                self.info.get("baseRate", self.info["sampleRate"]),
+                self.info.get("loopPoint", -1)
+            ), stream)
+        stream.write(self.raw)
+
     def __read_header_and_sample(self, stream):
-		header = stream.read(4)
-		
-		if header == b"SMPL":
-			pass
-		elif header == b"SMP2": # version 102+
-			pass
-		else:
-        	raise Exception("Not a sample?")
-        stream.read(4) # reserved
+        start = stream.tell()
+        self.block_id = stream.read(4)
 
-        self.info["name"] = read_as("string", stream)
+        if self.block_id not in (b"SMPL", b"SMP2"):
+            raise Exception("Not a sample?")
+        block_size = read_as_single("I", stream)
 
-        length = read_as_single("i", stream)
+        self.info["name"] = read_as("string", stream)
+        self.info["length"] = read_as_single("i", stream)
         self.info["sampleRate"] = read_as_single("i", stream)
-        self.info["volume"] = read_as_single("h", stream)
-        self.info["pitch"] = read_as_single("h", stream)
-        self.info["depth"] = FurnaceSampleType( read_as_single("b", stream) )
 
-        stream.read(1)
+        if self.block_id == b"SMP2": # version 102+
+            self.info["baseRate"] = read_as_single("i", stream)
+            self.info["depth"] = decode_enum(SAMPLE_TYPE_TABLE, FurnaceSampleType, read_as_single("B", stream))
+            self.info["loopDirection"] = read_as_single("B", stream)
+            self.info["flags"] = read_as_single("B", stream)
+            self.info["flags2"] = read_as_single("B", stream)
+            self.info["loopPoint"] = read_as_single("i", stream)
+            self.info["loopEnd"] = read_as_single("i", stream)
+            # which chips the sample is rendered for, a blob for now
+            self.info["renderOn"] = stream.read(16)
+            stream.read(4) # reserved
+        else:
+            self.info["volume"] = read_as_single("h", stream)
+            self.info["pitch"] = read_as_single("h", stream)
+            self.info["depth"] = decode_enum(SAMPLE_TYPE_TABLE, FurnaceSampleType, read_as_single("b", stream))
+            stream.read(1) # reserved
+            self.info["baseRate"] = read_as_single("h", stream)
+            self.info["loopPoint"] = read_as_single("i", stream)
 
-        self.info["baseRate"] = read_as_single("h", stream)
-        self.info["loopPoint"] = read_as_single("i", stream)
+        if block_size != 0:
+            size = start + 8 + block_size - stream.tell()
+        else:
+            # older versions leave the block size at 0, so go by the depth
+            size = sample_data_size(self.stored_depth, self.info["length"])
 
-        # how do I check versions in isolation??
-        for i in range(length):
-            self.data.append(read_as_single("b", stream))
+        if hasattr(stream, "read_view"):
+            self.raw = stream.read_view(size)
+        else:
+            self.raw = stream.read(size)
 
-    def __repr__(self):
-        return "<Furnace wavetable '%s'>" % ( self.name )
+    def __getstate__(self):
+        # memoryviews can't be pickled
+        state = self.__dict__.copy()
+        state["raw"] = bytes(self.raw)
+        return state
 
+    def __repr__(self):
+        return "<Furnace sample '%s'>" % ( self.info["name"] )
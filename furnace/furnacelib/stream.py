@@ -0,0 +1,226 @@
+import io
+import zlib
+
+class MemoryStream:
+    """
+    A read-only, file-like stream over any object supporting the buffer
+    protocol (`bytes`, `bytearray`, `mmap.mmap`...).
+
+    Unlike `io.BytesIO`, the buffer is not copied when the stream is made.
+    `read` only copies the bytes that are asked for, and `read_view` returns
+    a `memoryview` slice that doesn't copy anything at all.
+    """
+    def __init__(self, buffer):
+        self.__source = buffer
+        self.__view = memoryview(buffer).cast("B")
+        self.__pos = 0
+
+    def read(self, size=-1):
+        return self.read_view(size).tobytes()
+
+    def read_view(self, size=-1):
+        """
+        Like `read`, but returns a `memoryview` into the underlying buffer.
+        """
+        start = self.__pos
+        if (size is None) or (size < 0):
+            end = len(self.__view)
+        else:
+            end = min(start + size, len(self.__view))
+        self.__pos = max(end, start)
+        return self.__view[start:end]
+
+    def read_cstring(self):
+        """
+        Reads up to (and past) the next null byte, returning what came
+        before it.
+        """
+        if hasattr(self.__source, "find"):
+            end = self.__source.find(b"\x00", self.__pos)
+        else:
+            end = self.__find_null(self.__pos)
+        if end == -1:
+            raise Exception("Unterminated string")
+        text = self.__view[self.__pos:end].tobytes()
+        self.__pos = end + 1
+        return text
+
+    def __find_null(self, start, window=64):
+        # For buffers without `find` (e.g. memoryviews): copy a small window
+        # at a time rather than the whole buffer, doubling it each time
+        # since strings are usually short.
+        while start < len(self.__view):
+            found = self.__view[start:start + window].tobytes().find(b"\x00")
+            if found != -1:
+                return start + found
+            start += window
+            window *= 2
+        return -1
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            new_pos = offset
+        elif whence == io.SEEK_CUR:
+            new_pos = self.__pos + offset
+        elif whence == io.SEEK_END:
+            new_pos = len(self.__view) + offset
+        else:
+            raise ValueError("Invalid whence (%r)" % whence)
+        if new_pos < 0:
+            raise ValueError("Negative seek position %d" % new_pos)
+        self.__pos = new_pos
+        return self.__pos
+
+    def tell(self):
+        return self.__pos
+
+    def getbuffer(self):
+        """
+        The whole underlying buffer, as a `memoryview`.
+        """
+        return self.__view
+
+    def seekable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    def close(self):
+        """
+        Releases the buffer, and closes it too if it can be closed
+        (e.g. memory maps) and nothing else is using it.
+        """
+        if self.__view is None:
+            return
+        self.__view.release()
+        self.__view = None
+        if hasattr(self.__source, "close"):
+            try:
+                self.__source.close()
+            except BufferError:
+                # something still has a view into it (e.g. sample data),
+                # it'll be closed once that's gone
+                pass
+        self.__source = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def closed(self):
+        return self.__view is None
+
+class InflateStream:
+    """
+    A read-only, seekable, file-like stream over zlib-compressed data.
+
+    Data is only inflated up to the furthest position that has been read
+    so far, so a parser that only looks at the start of a compressed file
+    doesn't have to pay for decompressing the rest of it.
+
+    `source` is a readable stream of compressed data; if a `bytes`-like
+    object is given, it is wrapped in a `MemoryStream`.
+    """
+    def __init__(self, source, chunk_size=4096):
+        if not hasattr(source, "read"):
+            source = MemoryStream(source)
+        self.__source = source
+        self.__chunk_size = chunk_size
+        self.__inflater = zlib.decompressobj()
+        self.__buffer = bytearray()
+        self.__pos = 0
+        self.__eof = False
+
+    def __inflate_until(self, end):
+        # end=None inflates everything
+        while (not self.__eof) and ((end is None) or (len(self.__buffer) < end)):
+            chunk = self.__source.read(self.__chunk_size)
+            if chunk:
+                self.__buffer += self.__inflater.decompress(chunk)
+            else:
+                self.__buffer += self.__inflater.flush()
+                self.__eof = True
+            if self.__inflater.eof:
+                self.__eof = True
+
+    def read(self, size=-1):
+        start = self.__pos
+        if (size is None) or (size < 0):
+            self.__inflate_until(None)
+            end = len(self.__buffer)
+        else:
+            self.__inflate_until(start + size)
+            end = min(start + size, len(self.__buffer))
+        self.__pos = max(end, start)
+        return bytes(self.__buffer[start:end])
+
+    def read_cstring(self):
+        """
+        Reads up to (and past) the next null byte, returning what came
+        before it.
+        """
+        end = self.__buffer.find(b"\x00", self.__pos)
+        while (end == -1) and (not self.__eof):
+            searched = len(self.__buffer)
+            self.__inflate_until(searched + 1)
+            end = self.__buffer.find(b"\x00", max(searched, self.__pos))
+        if end == -1:
+            raise Exception("Unterminated string")
+        text = bytes(self.__buffer[self.__pos:end])
+        self.__pos = end + 1
+        return text
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            new_pos = offset
+        elif whence == io.SEEK_CUR:
+            new_pos = self.__pos + offset
+        elif whence == io.SEEK_END:
+            self.__inflate_until(None)
+            new_pos = len(self.__buffer) + offset
+        else:
+            raise ValueError("Invalid whence (%r)" % whence)
+        if new_pos < 0:
+            raise ValueError("Negative seek position %d" % new_pos)
+        self.__pos = new_pos
+        return self.__pos
+
+    def tell(self):
+        return self.__pos
+
+    @property
+    def inflated_size(self):
+        """
+        How many bytes have been decompressed so far.
+        """
+        return len(self.__buffer)
+
+    def seekable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    def close(self):
+        """
+        Drops the decompressed data and closes the source stream.
+        """
+        if self.__source is None:
+            return
+        self.__buffer = bytearray()
+        self.__source.close()
+        self.__source = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def closed(self):
+        return self.__source is None
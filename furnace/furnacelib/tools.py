@@ -1,3 +1,14 @@
+from .wavetable import rescale_wave
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+# GB wave RAM is 32 4-bit steps
+GB_WAVE_LENGTH = 32
+GB_WAVE_BITS = 4
+
 
 def pattern2seq(pattern):
 	"""
@@ -64,3 +75,62 @@ def pattern2seq(pattern):
 					note_length = 1
 
 	return note_bin
+
+def wave2gb(wavetable, use_numpy=False):
+	"""
+	Converts a FurnaceWavetable to GB wave RAM: resampled to 32 steps
+	(nearest step) and scaled from its range to 4 bits.
+
+	Returns a tuple of 32 values.
+	"""
+	wave = rescale_wave(wavetable.data, *wavetable.range, GB_WAVE_BITS, use_numpy)
+	length = len(wave)
+	if length == 0:
+		return (0,) * GB_WAVE_LENGTH
+	return tuple(int(wave[i * length // GB_WAVE_LENGTH]) for i in range(GB_WAVE_LENGTH))
+
+def pack_gb_waves(wavetables, use_numpy=False):
+	"""
+	Converts lots of FurnaceWavetables to GB wave RAM at once (see
+	`wave2gb`), merging the ones that end up the same.
+
+	Returns a list of the distinct waves, in order of first appearance,
+	and a list of which one each wavetable became.
+
+	With `use_numpy`, waves of the same length are converted together as
+	one matrix.
+	"""
+	wavetables = list(wavetables)
+	converted = [None] * len(wavetables)
+
+	if use_numpy and (numpy is not None):
+		by_length = {}
+		for i, wave in enumerate(wavetables):
+			by_length.setdefault(len(wave.data), []).append(i)
+		top = (1 << GB_WAVE_BITS) - 1
+		for length, members in by_length.items():
+			if length == 0:
+				for i in members:
+					converted[i] = (0,) * GB_WAVE_LENGTH
+				continue
+			matrix = numpy.stack([
+				numpy.asarray(wavetables[i].data, dtype=numpy.int64) for i in members
+			])
+			ranges = numpy.array([wavetables[i].range for i in members], dtype=numpy.int64)
+			low = ranges[:, :1]
+			high = ranges[:, 1:]
+			span = high - low
+			# same rounding as rescale_wave, flat waves become all 0
+			scaled = (
+				(numpy.clip(matrix, low, high) - low) * top * 2 + span
+			) // numpy.maximum(2 * span, 1)
+			scaled[(span <= 0)[:, 0]] = 0
+			steps = scaled[:, numpy.arange(GB_WAVE_LENGTH) * length // GB_WAVE_LENGTH]
+			for i, row in zip(members, steps.tolist()):
+				converted[i] = tuple(row)
+	else:
+		converted = [wave2gb(i) for i in wavetables]
+
+	unique = {}
+	wave_ids = [unique.setdefault(i, len(unique)) for i in converted]
+	return list(unique), wave_ids
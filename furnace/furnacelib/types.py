@@ -70,6 +70,32 @@ class FurnaceMacroCode(EnumShowNameOnly):
     EX8 = 19
     STOP = 255
 
+class FurnaceOpMacroCode(EnumShowNameOnly):
+    """
+    Used in FurnaceInstrumentDX, for the FM operator macros (O1-O4)
+    """
+    AM = 0
+    AR = 1
+    DR = 2
+    MULT = 3
+    RR = 4
+    SL = 5
+    TL = 6
+    DT2 = 7
+    RS = 8
+    DT = 9
+    D2R = 10
+    SSG_ENV = 11
+    DAM = 12
+    DVB = 13
+    EGT = 14
+    KSL = 15
+    SUS = 16
+    VIB = 17
+    WS = 18
+    KSR = 19
+    STOP = 255
+
 class FurnaceMacroType(EnumShowNameOnly):
     """
     Used in FurnaceInstrumentDX
@@ -244,3 +270,40 @@ class FurnaceChip(EnumShowNameOnly):
         member._value_ = id
         member.channels = channels
         return member
+
+# Decode tables
+#
+# Calling an enum to look a value up is fairly slow, which adds up when
+# it's done for every row of every pattern. These tables map raw values to
+# members directly; use them through `decode_enum`.
+
+def make_decode_table(enum):
+    """
+    A tuple of the enum's members, indexed by value. Values that aren't
+    members are None.
+    """
+    table = [None] * (max(i.value for i in enum) + 1)
+    for member in enum:
+        table[member.value] = member
+    return tuple(table)
+
+def decode_enum(table, enum, value):
+    """
+    Same as `enum(value)`, using a table from `make_decode_table`. Values
+    not in the table go through `enum`, so unknown values still raise
+    `ValueError`.
+    """
+    if 0 <= value < len(table):
+        member = table[value]
+        if member is not None:
+            return member
+    return enum(value)
+
+NOTE_TABLE = make_decode_table(FurnaceNote)
+MACRO_CODE_TABLE = make_decode_table(FurnaceMacroCode)
+OP_MACRO_CODE_TABLE = make_decode_table(FurnaceOpMacroCode)
+MACRO_TYPE_TABLE = make_decode_table(FurnaceMacroType)
+MACRO_SIZE_TABLE = make_decode_table(FurnaceMacroSize)
+SAMPLE_TYPE_TABLE = make_decode_table(FurnaceSampleType)
+INSTRUMENT_TYPE_TABLE = make_decode_table(FurnaceInstrumentType)
+CHIP_TABLE = make_decode_table(FurnaceChip)
@@ -1,58 +1,90 @@
 import struct
+from functools import lru_cache
 
-def read_as(format, file):
+# encoding of null-terminated strings, unless told otherwise
+STRING_ENCODING = "utf-8"
+
+@lru_cache(maxsize=None)
+def codec(format):
+    """
+    Compiles a `read_as` / `write_as` format into a little-endian
+    `struct.Struct`. Each format is only ever compiled once, so the
+    size of the data it describes is known without recounting.
+    """
+    return struct.Struct("<" + format)
+
+def read_string(file, encoding=None):
+    """
+    Reads a single null-terminated string from the file's current position,
+    decoded with `encoding` (`STRING_ENCODING` by default).
+
+    Streams that can find the terminator themselves (`MemoryStream`,
+    `InflateStream`) do it in one go; anything else is read in chunks.
+    """
+    if hasattr(file, "read_cstring"):
+        raw = file.read_cstring()
+    elif file.seekable():
+        raw = _read_cstring_chunked(file)
+    else:
+        raw = b""
+        char = file.read(1)
+        while char != b"\x00":
+            if char == b"":
+                raise Exception("Unterminated string")
+            raw += char
+            char = file.read(1)
+    return raw.decode(encoding or STRING_ENCODING)
+
+def _read_cstring_chunked(file, chunk_size=64):
+    chunks = []
+    while True:
+        chunk = file.read(chunk_size)
+        if chunk == b"":
+            raise Exception("Unterminated string")
+        end = chunk.find(b"\x00")
+        if end != -1:
+            chunks.append(chunk[:end])
+            # put back whatever was read past the terminator
+            file.seek(end + 1 - len(chunk), 1)
+            return b"".join(chunks)
+        chunks.append(chunk)
+
+def read_as(format, file, encoding=None):
     """
     Frontend to struct.unpack with automatic size inference.
     Always operates in little-endian.
 
     Passing `format="string"` will make it read a single null-terminated string
-    from the file's current position.
+    from the file's current position. (see `read_string`)
     """
     if format == "string":
-        text = ""
-        buffer = file.read(1)
-        while buffer != b"\x00":
-            text += buffer.decode('ascii') # probably unsafe
-            buffer = file.read(1)
-        return text
+        return read_string(file, encoding)
 
-    size = 0
-    known_sizes = {
-        "c": 1,
-        "b": 1, "B": 1,
-        "?": 1,
-        "h": 2, "H": 2,
-        "i": 4, "I": 4,
-        "l": 4, "L": 4,
-        "q": 8, "Q": 8,
-        "e": 2, "f": 4,
-        "d": 8
-    }
-    for i in format:
-        size += known_sizes.get(i, 0)
-    return struct.unpack("<"+format, file.read(size))
+    compiled = codec(format)
+    return compiled.unpack(file.read(compiled.size))
 
-def write_as(format, contents, file):
+def write_as(format, contents, file, encoding=None):
     """
     Frontend to struct.pack that always operates in little-endian.
 
-    Passing `format="string"` will make it read a single null-terminated string
-    from the file's current position.
+    Passing `format="string"` will make it write a single null-terminated string
+    to the file's current position, encoded with `encoding`
+    (`STRING_ENCODING` by default).
     
     contents is a tuple
     """
     if format == "string":
-        file.write( contents.encode("ascii") )
-        return file.write( b"\x00" )
+        return file.write( contents.encode(encoding or STRING_ENCODING) + b"\x00" )
     
-    return file.write( struct.pack("<"+format, *contents) )
+    return file.write( codec(format).pack(*contents) )
 
 def read_as_single(format, file):
     """
     If the `read_as` format is a single character it'll still
     return a tuple. This function turns it into a single value.
     """
-    return read_as(format, file)[0]
+    compiled = codec(format)
+    return compiled.unpack(file.read(compiled.size))[0]
 
 def truthy_to_boolbyte(value):
     """
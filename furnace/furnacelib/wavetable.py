@@ -1,13 +1,52 @@
 import zlib
 import io
+import sys
+from array import array
 from .util import read_as, read_as_single, write_as
 from .types import FurnaceChip, FurnaceNote, FurnaceInstrumentType, FurnaceMacroItem
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def clip_wave(data, low, high, use_numpy=False):
+    """
+    Clips every value of a wave to `low`..`high`.
+    """
+    if use_numpy and (numpy is not None):
+        return numpy.clip(numpy.asarray(data, dtype=numpy.int64), low, high).astype(numpy.uint32)
+    return array("I", [min(max(i, low), high) for i in data])
+
+def rescale_wave(data, low, high, bits, use_numpy=False):
+    """
+    Clips a wave to `low`..`high`, then scales it to fit in `bits` bits,
+    rounding to the nearest value.
+    """
+    top = (1 << bits) - 1
+    span = high - low
+    if span <= 0:
+        if use_numpy and (numpy is not None):
+            return numpy.zeros(len(data), dtype=numpy.uint32)
+        return array("I", bytes(4 * len(data)))
+    if use_numpy and (numpy is not None):
+        wave = numpy.clip(numpy.asarray(data, dtype=numpy.int64), low, high)
+        return (((wave - low) * top * 2 + span) // (2 * span)).astype(numpy.uint32)
+    return array("I", [
+        ((min(max(i, low), high) - low) * top * 2 + span) // (2 * span)
+        for i in data
+    ])
 
 class FurnaceWavetable:
+    """
+    `data` is an `array('I')` of the wave's values, or a NumPy array if
+    `FurnaceWavetable.use_numpy` is set (and NumPy is installed).
+    """
+    use_numpy = False
+
     # TODO: make it read .fuw files
     def __init__(self, file_name=None, stream=None):
-        self.data = []
+        self.data = array("I")
         self.range = (-1, -1)
         self.name = None
 
@@ -26,6 +65,13 @@ class FurnaceWavetable:
         self.__read_header(stream)
         self.__read_wave(stream)
 
+    def save_to_stream(self, stream):
+        stream.write(b"WAVE")
+        stream.write(b"\x00" * 4) # reserved
+        write_as("string", self.name, stream)
+        write_as("III", (len(self.data), *self.range), stream)
+        write_as("I" * len(self.data), self.data, stream)
+
     def __read_header(self, stream):
         if stream.read(4) != b"WAVE":
             raise Exception("Not a wavetable?")
@@ -35,10 +81,27 @@ class FurnaceWavetable:
     def __read_wave(self, stream):
         wave_size = read_as_single("I", stream)
         self.range = read_as("II", stream)
-        for i in range(wave_size):
-            # some values can extend beyond the range so clip it manually
-            # if you need to
-            self.data.append( read_as_single("I", stream) )
+        # some values can extend beyond the range, see `clipped`
+        body = stream.read(4 * wave_size)
+        if self.use_numpy and (numpy is not None):
+            self.data = numpy.frombuffer(body, dtype="<u4").astype(numpy.uint32)
+        else:
+            self.data = array("I", body)
+            if sys.byteorder != "little":
+                self.data.byteswap()
+
+    def clipped(self):
+        """
+        The wave, with every value clipped to `range`.
+        """
+        return clip_wave(self.data, *self.range, self.use_numpy)
+
+    def rescaled(self, bits):
+        """
+        The wave, clipped to `range` and scaled to `bits` bits (e.g. 4 for
+        GB wave RAM).
+        """
+        return rescale_wave(self.data, *self.range, bits, self.use_numpy)
 
     def __repr__(self):
         return "<Furnace wavetable '%s'>" % ( self.name )
@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+'''
+Makes dev127_youngster.fur, a dev127 copy of dppt_youngster.fur with its
+instruments as INS2 blocks, for roundtrip.py.
+
+The feature blocks are packed by hand here rather than through
+FuiDXFeatureBlock, so that the decoders get checked against bytes they
+didn't write themselves.
+'''
+
+import os, sys, io, struct
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+from furnacelib import FurnaceModule
+from furnacelib.instrument_dx import FurnaceInstrumentDX
+
+TESTS_PATH = sys.path[0]
+VERSION = 127
+
+# instrument name -> (duty macro, loop point) to give it
+DUTY_MACROS = {
+	"note_type *,*,3": ([0, 0, 1, 1, 2, 2], 2),
+	"note_type *,*,5": ([3, 2, 1], 255),
+}
+
+def feature(code, data):
+	return code + struct.pack("<H", len(data)) + data
+
+def make_ins2(instrument):
+	gameboy = instrument.data["gameboy"]
+	features = feature(b"NA", instrument.name.encode() + b"\x00")
+	features += feature(b"GB", struct.pack("<BBBB",
+		gameboy["volume"] | (gameboy["direction"] << 4) | (gameboy["length"] << 5),
+		gameboy["soundLength"],
+		0, # flags
+		0, # hardware sequence length
+	))
+	if instrument.name in DUTY_MACROS:
+		values, loop = DUTY_MACROS[instrument.name]
+		# macro header length, then the duty macro's header: code, length,
+		# loop, release, mode, open/type/word size, delay and speed
+		macros = struct.pack("<HBBBBBBBB", 8, 2, len(values), loop, 255, 0, 0, 0, 1)
+		macros += bytes(values) + b"\xff"
+		features += feature(b"MA", macros)
+	features += b"EN"
+	return b"INS2" + struct.pack("<IHH", len(features) + 4, VERSION, instrument.type.value) + features
+
+def v127_info_tail():
+	'''
+	Everything in INFO after the v83 compat flags, up to dev127.
+	'''
+	tail = bytes(28 - 9) # the rest of the compat flags
+	tail += struct.pack("<HH", 150, 150) # virtual tempo
+	tail += b"\x00" * 2 # first subsong name and comment
+	tail += bytes(4) # no more subsongs, reserved
+	tail += b"\x00" * 6 # system and album name, and the Japanese names
+	return tail
+
+if __name__ == '__main__':
+	fur = FurnaceModule(file_name=os.path.join(TESTS_PATH, 'dppt_youngster.fur'))
+	fur.meta["version"] = VERSION
+	fur.extendedCompatFlags = fur.extendedCompatFlags.ljust(9, b"\x00")
+	fur.unparsedInfo = v127_info_tail()
+	fur.instruments = [
+		FurnaceInstrumentDX(stream=io.BytesIO(make_ins2(i))) for i in fur.instruments
+	]
+	fur.save_to_file(os.path.join(TESTS_PATH, 'dev127_youngster.fur'), compressed=True)
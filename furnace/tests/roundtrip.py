@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+'''
+Loads each module given (default: every .fur in this folder), saves it and
+loads it back, and checks nothing changed along the way:
+
+- every dev127+ feature block encodes back to the bytes it was read from
+- saving the reloaded module gives the same bytes again, eagerly or lazily
+  loaded and with incremental saving
+- a module saved by a version that fills in block sizes (like
+  dev127_youngster.fur, see make_dev127.py) saves back byte for byte
+
+None of the modules here have samples, so SMPL and SMP2 blocks are packed
+by hand and checked separately.
+'''
+
+import os, sys, io, glob, zlib, struct, pickle
+sys.path.insert(1, os.path.join(sys.path[0], '..'))
+
+from furnacelib import FurnaceModule, FurnaceSample, FurnaceSampleType
+from furnacelib.instrument_dx import FurnaceInstrumentDX
+
+SAMPLE_VALUES = [-3, 100, -20000, 7, 32767]
+
+def check_features(fur):
+	problems = []
+	for instrument in fur.instruments:
+		if not isinstance(instrument, FurnaceInstrumentDX):
+			continue
+		for block in instrument.data:
+			raw = block.serialize()
+			# decoding caches the value, which serialize then encodes again
+			block.interpret_data()
+			if block.serialize() != raw:
+				problems.append(f"{instrument.name}: {block.code} block changed")
+		if instrument.data[-1].code != "EN":
+			problems.append(f"{instrument.name}: no EN block at the end")
+	return problems
+
+def load(data, lazy):
+	fur = FurnaceModule(lazy=lazy)
+	fur.load_from_bytes(data)
+	return fur
+
+def make_smpl(depth, values, raw_format, block_size=True):
+	data = struct.pack(f"<{len(values)}{raw_format}", *values)
+	block = b"kick\x00" + struct.pack("<iihhbbhi",
+		len(values), 22050, 50, 0, depth.value, 0, 22050, -1
+	) + data
+	return b"SMPL" + struct.pack("<I", len(block) if block_size else 0) + block
+
+def make_smp2(depth, values, raw_format):
+	data = struct.pack(f"<{len(values)}{raw_format}", *values)
+	block = b"snare\x00" + struct.pack("<iiiBBBBii",
+		len(values), 32000, 32000, depth.value, 0, 1, 0, -1, -1
+	) + bytes(16) + bytes(4) + data
+	return b"SMP2" + struct.pack("<I", len(block)) + block
+
+def check_samples():
+	problems = []
+
+	# before version 58 samples are 16-bit whatever the depth says, and
+	# the block size isn't filled in
+	block = make_smpl(FurnaceSampleType.PCM_8, SAMPLE_VALUES, "h", block_size=False)
+	sample = FurnaceSample(stream=io.BytesIO(block + b"INST"), version=57)
+	if list(sample.data) != SAMPLE_VALUES:
+		problems.append("version 57 SMPL: 16-bit data misread")
+
+	cases = [
+		("dppt_youngster.fur", make_smpl(FurnaceSampleType.PCM_8, [-128, 0, 5, 127], "b")),
+		("dppt_youngster.fur", make_smpl(FurnaceSampleType.PCM_16, SAMPLE_VALUES, "h")),
+		("dev127_youngster.fur", make_smp2(FurnaceSampleType.PCM_16, SAMPLE_VALUES, "h")),
+		("dev127_youngster.fur", make_smp2(FurnaceSampleType.SNES_BRR, [1] * 18, "B")),
+	]
+	for file_name, block in cases:
+		name = f"{file_name} + {block[:4].decode()}"
+		fur = FurnaceModule(file_name=os.path.join(sys.path[0], file_name))
+		sample = FurnaceSample(stream=io.BytesIO(block), version=fur.meta["version"])
+		expected = list(sample.data)
+		saved_block = io.BytesIO()
+		sample.save_to_stream(saved_block)
+		# saving leaves the size to the module
+		if saved_block.getvalue()[8:] != block[8:]:
+			problems.append(f"{name}: sample saved differently")
+
+		fur.samples = [sample]
+		saved = fur.save_to_bytes()
+		for lazy in (False, True):
+			reloaded = load(saved, lazy)
+			if list(reloaded.samples[0].data) != expected:
+				problems.append(f"{name}: sample data changed (lazy={lazy})")
+			if reloaded.save_to_bytes() != saved:
+				problems.append(f"{name}: saved differently (lazy={lazy})")
+		unpickled = pickle.loads(pickle.dumps(load(saved, False)))
+		if list(unpickled.samples[0].data) != expected:
+			problems.append(f"{name}: sample data changed by pickling")
+	return problems
+
+def roundtrip(file_name):
+	with open(file_name, 'rb') as fur_in:
+		original = fur_in.read()
+	try:
+		original = zlib.decompress(original)
+	except zlib.error:
+		pass
+
+	problems = check_features(load(original, False))
+	saved = load(original, False).save_to_bytes()
+	for lazy in (False, True):
+		for incremental in (False, True):
+			again = load(saved, lazy).save_to_bytes(incremental)
+			if again != saved:
+				problems.append(f"saved differently (lazy={lazy}, incremental={incremental})")
+	return problems, saved == original
+
+if __name__ == '__main__':
+	file_names = sys.argv[1:] or sorted(glob.glob(os.path.join(sys.path[0], '*.fur')))
+	failed = 0
+	for file_name in file_names:
+		problems, identical = roundtrip(file_name)
+		print(f"{os.path.basename(file_name)}: {'FAILED' if problems else 'ok'}{' (byte for byte)' if identical else ''}")
+		for problem in problems:
+			print(f"  {problem}")
+		failed += bool(problems)
+	problems = check_samples()
+	print(f"samples: {'FAILED' if problems else 'ok'}")
+	for problem in problems:
+		print(f"  {problem}")
+	failed += bool(problems)
+	exit(1 if failed else 0)
@@ -3,6 +3,7 @@
 # TODO: Fix noise
 import re
 import sys
+import io
 import datetime
 
 COMMANDS_RE = re.compile(
@@ -357,12 +358,24 @@ def commands2asm(commands):
     
     return asm_bin
 
-with open(sys.argv[1], "r") as mml_file:
+def convert(mml, stream=None):
+    """
+    Writes the asm for MML source text to `stream`, or returns it as a
+    string if no stream is given.
+    """
+    global num_loop_points
+
+    if stream is None:
+        stream = io.StringIO()
+        convert(mml, stream)
+        return stream.getvalue()
+
+    # loop labels are numbered per song
+    num_loop_points = 0
+
     song_name = "Untitled"
     author_name = None
     
-    mml = mml_file.read()
-    
     # get rid of all comments
     mml = re.sub(r"//[^\n]+$|/\*.+?\*/", "", mml, 0, re.DOTALL | re.IGNORECASE | re.MULTILINE)
     
@@ -378,10 +391,10 @@ with open(sys.argv[1], "r") as mml_file:
             case "#":
                 pass # this is a comment
     
-    print("; %s" % song_name)
+    print("; %s" % song_name, file=stream)
     if author_name:
-        print("; by %s" % author_name)
-    print("\n; generated by mml2pret.py on %s\n" % datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        print("; by %s" % author_name, file=stream)
+    print("\n; generated by mml2pret.py on %s\n" % datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), file=stream)
     
     song_name = song_name.title().replace(" ","")
     channels = {}
@@ -400,41 +413,48 @@ with open(sys.argv[1], "r") as mml_file:
     for i in channels:
         channels[i] = "\n".join(commands2asm(mml2commands(channels[i], is_drums=(i.lower() == "d"))))
     
-    print("Music_%s:" % song_name)
-    print("; G/S/C header")
-    print("\tchannel_count %d" % len(channels))
+    print("Music_%s:" % song_name, file=stream)
+    print("; G/S/C header", file=stream)
+    print("\tchannel_count %d" % len(channels), file=stream)
     channel = 0
     for i in channels:
         match i.lower():
             case "a":
-                print("\tchannel 1, Music_%s_Ch1" % song_name)
+                print("\tchannel 1, Music_%s_Ch1" % song_name, file=stream)
             case "b":
-                print("\tchannel 2, Music_%s_Ch2" % song_name)
+                print("\tchannel 2, Music_%s_Ch2" % song_name, file=stream)
             case "c":
-                print("\tchannel 3, Music_%s_Ch3" % song_name)
+                print("\tchannel 3, Music_%s_Ch3" % song_name, file=stream)
             case "d":
-                print("\tchannel 4, Music_%s_Ch4" % song_name)
+                print("\tchannel 4, Music_%s_Ch4" % song_name, file=stream)
             case _:
                 raise Exception("Valid channels are A, B, C, D")
     for i in channels:
-        print()
+        print(file=stream)
         match i.lower():
             case "a":
-                print("Music_%s_Ch1:" % song_name)
-                print(channels[i])
-                print("\tsound_ret")
+                print("Music_%s_Ch1:" % song_name, file=stream)
+                print(channels[i], file=stream)
+                print("\tsound_ret", file=stream)
             case "b":
-                print("Music_%s_Ch2:" % song_name)
-                print(channels[i])
-                print("\tsound_ret")
+                print("Music_%s_Ch2:" % song_name, file=stream)
+                print(channels[i], file=stream)
+                print("\tsound_ret", file=stream)
             case "c":
-                print("Music_%s_Ch3:" % song_name)
-                print(channels[i])
-                print("\tsound_ret")
+                print("Music_%s_Ch3:" % song_name, file=stream)
+                print(channels[i], file=stream)
+                print("\tsound_ret", file=stream)
             case "d":
-                print("Music_%s_Ch4:" % song_name)
-                print(channels[i])
-                print("\tsound_ret")
+                print("Music_%s_Ch4:" % song_name, file=stream)
+                print(channels[i], file=stream)
+                print("\tsound_ret", file=stream)
             case _:
                 raise Exception("Valid channels are A, B, C, D")
-    
\ No newline at end of file
+    
+
+def convert_file(file_name, stream=None):
+    with open(file_name, "r") as mml_file:
+        return convert(mml_file.read(), stream)
+
+if __name__ == "__main__":
+    convert_file(sys.argv[1], sys.stdout)